@@ -0,0 +1,49 @@
+"""
+Compare the shared value formatter with the formatting previously used by the
+converters for the [Data] sections of KolXPD files.
+
+Run with:
+
+    python benchmarks/bench_formatting.py [num_values]
+"""
+
+import sys
+import timeit
+
+import numpy as np
+
+from xps_convert.formatting import format_values
+
+
+def igor_str_join(values: np.ndarray) -> str:
+    """Previous formatting of convert_igor"""
+    return "\n".join(str(i) for i in values) + "\n"
+
+
+def specs_char_mod(values: np.ndarray) -> str:
+    """Previous formatting of Specs_XY_Data_Block.write_as_region"""
+    return "\n".join(np.char.mod("%f", values)) + "\n"
+
+
+def main() -> None:
+    num_values = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = np.random.default_rng(0)
+    values = rng.uniform(0, 1e5, num_values)
+
+    assert format_values(values) == igor_str_join(values)
+    assert format_values(values, 6) == specs_char_mod(values)
+
+    cases = [
+        ("igor: str join", lambda: igor_str_join(values)),
+        ("igor: format_values round-trip", lambda: format_values(values)),
+        ("specs: np.char.mod %f", lambda: specs_char_mod(values)),
+        ("specs: format_values precision=6", lambda: format_values(values, 6)),
+    ]
+    print(f"Formatting {num_values} float64 values (best of 3)")
+    for name, func in cases:
+        seconds = min(timeit.repeat(func, number=1, repeat=3))
+        print(f"{name:<36} {seconds:8.3f} s  {num_values / seconds / 1e6:6.2f} M values/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark the parse, transform and render stages of the Igor and Prodigy XY
+converters on synthetic files, see synthetic.py.
+
+Every stage is timed separately (best of --repeat runs) and reported as
+throughput in MB/s of input and spectra/s. The results are written as JSON,
+so runs of different commits can be compared:
+
+    python benchmarks/run.py --output before.json
+    git checkout other-branch
+    python benchmarks/run.py --output after.json --compare before.json
+"""
+
+import argparse
+from collections.abc import Callable
+import contextlib
+import datetime
+import io
+import json
+import os
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+import numpy as np
+
+from igor.ibw import read_ibw
+from igor.packed import PackedFile
+from xps_convert.igor_to_kolxpd import average_rows, convert_igor, write_wave
+from xps_convert.specs_xy_to_kolxpd import (
+    get_data_avg,
+    iter_xy_regions,
+    write_specs_prodigy_xy,
+    write_xy_region,
+)
+
+sys.path.insert(0, str(Path(__file__).parent))
+import synthetic  # noqa: E402
+
+
+def best_time(func: Callable[[], Any], repeat: int) -> float:
+    """Best wall time of `repeat` calls of func, printed output is discarded"""
+    times: list[float] = []
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=Path(__file__).parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_igor(workdir: Path, args: argparse.Namespace) -> list[dict[str, Any]]:
+    pxt = workdir / "Synthetic0001.pxt"
+    ibw = workdir / "Synthetic0002.ibw"
+    spectra = synthetic.write_pxt(pxt, args.waves, args.points, args.cycles)
+    ibw_spectra = synthetic.write_ibw(ibw, args.points, args.cycles)
+    size = pxt.stat().st_size
+
+    def render() -> None:
+        with open(os.devnull, "w") as f:
+            for wave in waves:
+                write_wave(f, "Synthetic", wave)
+
+    def transform() -> None:
+        for wave in waves:
+            n_dim = wave.wave_header.n_dim
+            if n_dim[1] != 0:
+                _ = average_rows(wave.data.reshape(n_dim[1], n_dim[0]))
+
+    waves = PackedFile(str(pxt), memory_map=True).records
+    stages: list[tuple[str, Callable[[], Any], int, int]] = [
+        ("parse pxt", lambda: PackedFile(str(pxt)), size, spectra),
+        ("parse pxt mmap", lambda: PackedFile(str(pxt), memory_map=True), size, spectra),
+        ("parse ibw", lambda: read_ibw(str(ibw)), ibw.stat().st_size, ibw_spectra),
+        ("transform", transform, size, spectra),
+        ("render", render, size, spectra),
+        (
+            "convert",
+            lambda: convert_igor("Synthetic", [pxt], workdir / "Synthetic.exp"),
+            size,
+            spectra,
+        ),
+    ]
+    return [result("igor", *stage, args.repeat) for stage in stages]
+
+
+def bench_xy(workdir: Path, args: argparse.Namespace) -> list[dict[str, Any]]:
+    xy = workdir / "synthetic.xy"
+    spectra = synthetic.write_xy(
+        xy, args.groups, args.regions, args.cycles, args.scans, args.points
+    )
+    size = xy.stat().st_size
+
+    def transform() -> None:
+        for region in regions:
+            for data_blocks in region.data_per_cycle.values():
+                if len(data_blocks) > 1:
+                    _ = get_data_avg(data_blocks)
+
+    def render() -> None:
+        with open(os.devnull, "w") as f:
+            for region in regions:
+                write_xy_region(f, region)
+
+    def convert() -> None:
+        with open(os.devnull, "w") as f:
+            write_specs_prodigy_xy(xy, f)
+
+    regions = list(iter_xy_regions(xy))
+    stages: list[tuple[str, Callable[[], Any], int, int]] = [
+        ("parse", lambda: list(iter_xy_regions(xy)), size, spectra),
+        ("transform", transform, size, spectra),
+        ("render", render, size, spectra),
+        ("convert", convert, size, spectra),
+    ]
+    return [result("xy", *stage, args.repeat) for stage in stages]
+
+
+def result(
+    format_: str,
+    stage: str,
+    func: Callable[[], Any],
+    size: int,
+    spectra: int,
+    repeat: int,
+) -> dict[str, Any]:
+    seconds = best_time(func, repeat)
+    return {
+        "format": format_,
+        "stage": stage,
+        "seconds": seconds,
+        "bytes": size,
+        "spectra": spectra,
+        "mb_per_s": size / seconds / 1e6,
+        "spectra_per_s": spectra / seconds,
+    }
+
+
+def print_results(results: list[dict[str, Any]], baseline: dict[str, float]) -> None:
+    print(f"{'benchmark':<20} {'seconds':>9} {'MB/s':>9} {'spectra/s':>11}")
+    for r in results:
+        name = f"{r['format']}: {r['stage']}"
+        line = f"{name:<20} {r['seconds']:9.4f} {r['mb_per_s']:9.2f} {r['spectra_per_s']:11.1f}"
+        if name in baseline:
+            line += f"  {baseline[name] / r['seconds']:6.2f}x"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    _ = parser.add_argument("--points", type=int, default=1000, help="points per spectrum")
+    _ = parser.add_argument("--waves", type=int, default=50, help="waves per pxt file")
+    _ = parser.add_argument("--cycles", type=int, default=20, help="cycles per wave and xy region")
+    _ = parser.add_argument("--scans", type=int, default=5, help="scans per xy cycle")
+    _ = parser.add_argument("--groups", type=int, default=2, help="groups per xy file")
+    _ = parser.add_argument("--regions", type=int, default=5, help="regions per xy group")
+    _ = parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the best is reported")
+    _ = parser.add_argument("--output", type=Path, help="write the results as JSON")
+    _ = parser.add_argument("--compare", type=Path, help="JSON results to compare with")
+    _ = parser.add_argument("--workdir", type=Path, help="keep the synthetic files here")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = args.workdir or Path(tmp)
+        workdir.mkdir(parents=True, exist_ok=True)
+        results = bench_igor(workdir, args) + bench_xy(workdir, args)
+
+    baseline: dict[str, float] = {}
+    if args.compare:
+        previous = json.loads(args.compare.read_text())
+        baseline = {f"{r['format']}: {r['stage']}": r["seconds"] for r in previous["results"]}
+    print_results(results, baseline)
+
+    if args.output:
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "platform": platform.platform(),
+            },
+            "params": {
+                k: v for k, v in vars(args).items() if k not in ("output", "compare", "workdir")
+            },
+            "results": results,
+        }
+        _ = args.output.write_text(json.dumps(report, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
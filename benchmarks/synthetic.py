@@ -0,0 +1,161 @@
+"""
+Generators for synthetic .pxt, .ibw and .xy files of configurable size, used
+by the benchmarks. The files mimic the layout of the files written by Scienta
+SES (Igor) and SpecsLab Prodigy, with random counts.
+"""
+
+from pathlib import Path
+
+import numpy as np
+from numpy.typing import NDArray
+
+import igor.writer
+from igor.writer import EncodedWave, encode_binary_wave, write_packed_file
+
+SES_NOTE = """[SES]
+Version=1.2.5
+Region Name={name}
+Lens Mode=SwiftAcc_HiPP3L
+Pass Energy=100
+Number of Sweeps=1
+Excitation Energy=307.0
+Energy Scale=Binding
+Acquisition Mode=Fixed
+Energy Unit=Binding
+Low Energy={low}
+High Energy={high}
+Energy Step={step}
+Step Time=96
+"""
+
+
+def counts(rng: np.random.Generator, points: int, cycles: int) -> NDArray[np.float64]:
+    """Random counts of `cycles` spectra with a peak on a linear background"""
+    x = np.linspace(-1, 1, points)
+    spectrum = 1000 + 200 * x + 5000 * np.exp(-(x**2) / 0.01)
+    return rng.poisson(spectrum, size=(max(cycles, 1), points)).astype(np.float64)
+
+
+def wave(name: str, data: NDArray[np.float64], start: float, step: float) -> EncodedWave:
+    """Encode a wave like the ones written by SES
+
+    `data` holds one spectrum per row, a single row is stored as a 1D wave.
+    """
+    cycles, points = data.shape
+    note = SES_NOTE.format(name=name, low=start, high=start + step * (points - 1), step=step)
+    if cycles == 1:
+        return encode_binary_wave(
+            data[0],
+            name,
+            note=note,
+            start=(start,),
+            step=(step,),
+            extended_data_units="Counts [a.u.]",
+            dim_e_units=["Binding Energy [eV]"],
+        )
+    # Igor stores the spectra as the columns of the wave
+    return encode_binary_wave(
+        data.T,
+        name,
+        note=note,
+        start=(start, 1),
+        step=(step, 1),
+        extended_data_units="Counts [a.u.]",
+        dim_e_units=["Binding Energy [eV]", "Seq. Iteration[a.u.]"],
+    )
+
+
+def write_pxt(
+    path: Path, waves: int, points: int, cycles: int, seed: int = 0
+) -> int:
+    """Write a packed experiment file with `waves` wave records
+
+    The waves are generated one at a time, so the size of the file is not
+    limited by the memory.
+
+    Returns:
+        The number of spectra in the file
+    """
+    rng = np.random.default_rng(seed)
+    write_packed_file(
+        str(path),
+        (
+            wave(f"Region{i}_{path.stem}"[:31], counts(rng, points, cycles), 86.0, -0.05)
+            for i in range(waves)
+        ),
+    )
+    return waves * max(cycles, 1)
+
+
+def write_ibw(path: Path, points: int, cycles: int, seed: int = 0) -> int:
+    """Write an Igor binary wave file
+
+    Returns:
+        The number of spectra in the file
+    """
+    rng = np.random.default_rng(seed)
+    igor.writer.write_ibw(str(path), wave(path.stem[:31], counts(rng, points, cycles), 86.0, -0.05))
+    return max(cycles, 1)
+
+
+def xy_header_line(key: str, value: object) -> str:
+    return f"{f'# {key}:':<32}{value}\n"
+
+
+def write_xy(
+    path: Path,
+    groups: int,
+    regions: int,
+    cycles: int,
+    scans: int,
+    points: int,
+    seed: int = 0,
+) -> int:
+    """Write an XY file in the format exported by SpecsLab Prodigy
+
+    Every region has `cycles` cycles of `scans` separately exported scans.
+
+    Returns:
+        The number of spectra in the file
+    """
+    rng = np.random.default_rng(seed)
+    energies = 86.31 + np.arange(points, dtype=np.float64)
+    with open(path, "w", encoding="latin-1") as f:
+        _ = f.write(
+            "# Created by:        SpecsLab Prodigy, Version 4.120.1-r122398\n"
+            "#\n"
+            "# XY-Serializer Export Settings:\n"
+            "#   Comment Prefix:           #\n"
+            "#   Energy Axis:              Kinetic Energy\n"
+            "#   Separate Scan Data:       yes\n"
+            "#\n"
+        )
+        for g in range(groups):
+            _ = f.write(xy_header_line("Group", f"Synthetic group {g}") + "#\n")
+            for r in range(regions):
+                _ = f.write(
+                    xy_header_line("Region", f"Region {r}")
+                    + xy_header_line("Analyzer Lens", "SmallArea:3.5kV")
+                    + xy_header_line("Scan Variable", "Kinetic Energy")
+                    + xy_header_line("Values/Curve", points)
+                    + xy_header_line("Dwell Time", 0.1)
+                    + xy_header_line("Excitation Energy", 1486.61)
+                    + xy_header_line("Pass Energy", 60)
+                    + xy_header_line("Detector Voltage", 1750)
+                    + xy_header_line("Eff. Workfunction", 4.367)
+                    + xy_header_line("Comment", "")
+                    + "\n"
+                )
+                for c in range(cycles):
+                    _ = f.write(f"# Cycle: {c}\n#\n# Number of Scans: {scans}\n\n")
+                    data = counts(rng, points, scans)
+                    for s in range(scans):
+                        _ = f.write(
+                            f"# Cycle: {c}, Curve: 0, Scan: {s}\n#\n"
+                            + xy_header_line("ColumnLabels", "energy counts/s")
+                            + "#\n"
+                        )
+                        block = np.column_stack((energies, data[s]))
+                        np.savetxt(f, block, fmt="%.2f  %g")
+                        _ = f.write("\n")
+    return groups * regions * cycles * scans
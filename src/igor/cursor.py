@@ -1,13 +1,71 @@
-from io import BufferedReader
+import mmap
 import struct
-from typing import cast
+from typing import Any, cast
+
+import numpy as np
+from numpy.typing import NDArray
+
+U8 = struct.Struct("<B")
+I8 = struct.Struct("<b")
+U16 = struct.Struct("<H")
+I16 = struct.Struct("<h")
+U32 = struct.Struct("<I")
+I32 = struct.Struct("<i")
+U64 = struct.Struct("<Q")
+F32 = struct.Struct("<f")
+F64 = struct.Struct("<d")
+
+Buffer = bytes | bytearray | memoryview | mmap.mmap
+
+
+class CursorError(ValueError):
+    """Raised when reading beyond the end of the buffer of a Cursor"""
+
+    def __init__(self, offset: int, num_bytes: int, size: int):
+        self.offset = offset
+        self.num_bytes = num_bytes
+        self.size = size
+        super().__init__(
+            f"Cannot read {num_bytes} bytes at offset {offset}: "
+            f"the buffer ends at {size}, the data is truncated"
+        )
+
+
+def decode_string(raw: bytes, encoding: str = "latin-1") -> str:
+    """Decode a fixed-length byte string, which ends at the first NUL
+
+    Args:
+        raw: The bytes to decode
+        encoding: The encoding of the string
+
+    Returns:
+        The decoded string
+    """
+    end = raw.find(b"\x00")
+    return (raw if end == -1 else raw[:end]).decode(encoding)
 
 
 class Cursor:
-    """Class for handeling a buffer"""
+    """Class for reading a buffer at a moving offset
+
+    The whole file has to be in the buffer, either read into memory or
+    memory mapped. Reading beyond the end of the buffer raises a CursorError.
 
-    def __init__(self, buffer: BufferedReader):
+    Args:
+        buffer: The buffer to read
+        position: The initial byte-position of the cursor
+    """
+
+    def __init__(self, buffer: Buffer, position: int = 0):
+        if isinstance(buffer, memoryview) and buffer.format != "B":
+            buffer = buffer.cast("B")
         self._buffer = buffer
+        self._size = len(buffer)
+        self._position = 0
+        self.set_position(position)
+
+    def __len__(self) -> int:
+        return self._size
 
     def position(self) -> int:
         """Get the current postition of the cursor
@@ -15,7 +73,7 @@ class Cursor:
         Returns:
             int: The current cursor position
         """
-        return self._buffer.tell()
+        return self._position
 
     def set_position(self, position: int) -> None:
         """Set the postition of the cursor
@@ -23,7 +81,9 @@ class Cursor:
         Args:
             position: Byte-position to set
         """
-        _ = self._buffer.seek(position)
+        if not 0 <= position <= self._size:
+            raise CursorError(position, 0, self._size)
+        self._position = position
 
     def skip(self, bytes_to_skip: int) -> None:
         """Skip bytes of the buffer
@@ -31,7 +91,15 @@ class Cursor:
         Args:
             bytes_to_skip: Number of bytes to skip
         """
-        self.set_position(self._buffer.tell() + bytes_to_skip)
+        self.set_position(self._position + bytes_to_skip)
+
+    def _advance(self, num_bytes: int) -> int:
+        """Move the cursor by num_bytes and return the previous position"""
+        position = self._position
+        if num_bytes < 0 or position + num_bytes > self._size:
+            raise CursorError(position, num_bytes, self._size)
+        self._position = position + num_bytes
+        return position
 
     def read(self, num_bytes: int) -> bytes:
         """Read bytes, while moving cursor
@@ -42,20 +110,47 @@ class Cursor:
         Returns:
             bytes: The read bytes
         """
-        return self._buffer.read(num_bytes)
+        position = self._advance(num_bytes)
+        return bytes(self._buffer[position : position + num_bytes])
 
-    def read_string(self, str_len: int) -> str:
-        """Read bytes as string
+    def read_array(self, dtype: np.dtype, count: int) -> NDArray[np.generic]:
+        """Read `count` items of `dtype`, while moving cursor
+
+        The returned array is a view into the buffer, which is read-only for
+        bytes and read-only memory maps, no data is copied.
+
+        Args:
+            dtype: The dtype of the items
+            count: Number of items to read
+
+        Returns:
+            The read array
+        """
+        position = self._advance(count * dtype.itemsize)
+        return np.frombuffer(self._buffer, dtype=dtype, count=count, offset=position)
+
+    def read_string(self, str_len: int, encoding: str = "latin-1") -> str:
+        """Read a fixed-length string, which ends at the first NUL
 
         Args:
             str_len: Length of the string to read
+            encoding: The encoding of the string
 
         Returns:
             The read string
         """
-        return "".join([chr(i).rstrip("\x00") for i in self._buffer.read(str_len)])
-        # bytes_ = self._buffer.read(str_len)
-        # return bytes_.decode("utf-8").rstrip("\x00")
+        return decode_string(self.read(str_len), encoding)
+
+    def read_struct(self, struct_: struct.Struct) -> tuple[Any, ...]:
+        """Read and unpack a fixed-layout block, while moving cursor
+
+        Args:
+            struct_: Precompiled struct describing the block
+
+        Returns:
+            The unpacked values
+        """
+        return struct_.unpack_from(self._buffer, self._advance(struct_.size))
 
     def read_u8_le(self) -> int:
         """Read a 8-bit unsigned integer
@@ -63,7 +158,7 @@ class Cursor:
         Returns:
             The read integer
         """
-        return cast(int, struct.unpack("<B", self._buffer.read(1))[0])
+        return cast(int, self.read_struct(U8)[0])
 
     def read_i8_le(self) -> int:
         """Read a 8-bit signed integer
@@ -71,7 +166,7 @@ class Cursor:
         Returns:
             The read integer
         """
-        return cast(int, struct.unpack("<b", self._buffer.read(1))[0])
+        return cast(int, self.read_struct(I8)[0])
 
     def read_u16_le(self) -> int:
         """Read a 16-bit unsigned integer
@@ -79,7 +174,7 @@ class Cursor:
         Returns:
             The read integer
         """
-        return cast(int, struct.unpack("<H", self._buffer.read(2))[0])
+        return cast(int, self.read_struct(U16)[0])
 
     def read_i16_le(self) -> int:
         """Read a 16-bit signed integer
@@ -87,7 +182,7 @@ class Cursor:
         Returns:
             The read integer
         """
-        return cast(int, struct.unpack("<h", self._buffer.read(2))[0])
+        return cast(int, self.read_struct(I16)[0])
 
     def read_u32_le(self) -> int:
         """Read a 32-bit unsigned integer
@@ -95,7 +190,7 @@ class Cursor:
         Returns:
             The read integer
         """
-        return cast(int, struct.unpack("<I", self._buffer.read(4))[0])
+        return cast(int, self.read_struct(U32)[0])
 
     def read_i32_le(self) -> int:
         """Read a 32-bit signed integer
@@ -103,7 +198,7 @@ class Cursor:
         Returns:
             The read integer
         """
-        return cast(int, struct.unpack("<i", self._buffer.read(4))[0])
+        return cast(int, self.read_struct(I32)[0])
 
     def read_u64_le(self) -> int:
         """Read a 64-bit unsigned integer
@@ -111,15 +206,15 @@ class Cursor:
         Returns:
             The read integer
         """
-        return cast(int, struct.unpack("<q", self._buffer.read(8))[0])
+        return cast(int, self.read_struct(U64)[0])
 
     def read_f32_le(self) -> float:
-        """Read a 64-bit floating point number
+        """Read a 32-bit floating point number
 
         Returns:
             The read float
         """
-        return cast(float, struct.unpack("<f", self._buffer.read(4))[0])
+        return cast(float, self.read_struct(F32)[0])
 
     def read_f64_le(self) -> float:
         """Read a 64-bit floating point number
@@ -127,4 +222,4 @@ class Cursor:
         Returns:
             The read float
         """
-        return cast(float, struct.unpack("<d", self._buffer.read(8))[0])
+        return cast(float, self.read_struct(F64)[0])
@@ -1,7 +1,24 @@
 from dataclasses import dataclass
+from functools import cached_property
+import struct
 from typing import Self, override
 
-from igor.cursor import Cursor
+import numpy as np
+from numpy.typing import NDArray
+
+from igor.cursor import Cursor, decode_string
+
+# Fixed layouts of the headers, all little-endian without padding
+BIN_HEADER_V2_STRUCT = struct.Struct("<hiiih")
+BIN_HEADER_V5_STRUCT = struct.Struct("<hhiiii4i4iiii")
+WAVE_HEADER_V2_STRUCT = struct.Struct("<hI20shhI4s4sihddhhhddBBIiI2sII")
+WAVE_HEADER_V5_STRUCT = struct.Struct("<IIIihh6sh32siI4I4d4d4s16BhhddI4I4II16ihhhBBIihhIi")
+
+# Number of bytes of the largest bin header and wave header, of version 5
+MAX_WAVE_HEADERS_SIZE = BIN_HEADER_V5_STRUCT.size + WAVE_HEADER_V5_STRUCT.size
+
+# Dimension labels are stored NUL-padded in blocks of MAX_DIM_LABEL_CHARS + 1
+MAX_DIM_LABEL_CHARS = 31
 
 
 @dataclass
@@ -41,11 +58,9 @@ class BinHeaderV2:
 
     @classmethod
     def from_buffer(cls, cursor: Cursor) -> Self:
-        version = cursor.read_i16_le()
-        wfm_size = cursor.read_i32_le()
-        note_size = cursor.read_i32_le()
-        pict_size = cursor.read_i32_le()
-        checksum = cursor.read_i16_le()
+        version, wfm_size, note_size, pict_size, checksum = cursor.read_struct(
+            BIN_HEADER_V2_STRUCT
+        )
 
         return cls(
             version,
@@ -110,19 +125,15 @@ class BinHeaderV5:
 
     @classmethod
     def from_buffer(cls, cursor: Cursor) -> Self:
-        version = cursor.read_i16_le()
-        checksum = cursor.read_i16_le()
-        wfm_size = cursor.read_i32_le()
-        formula_size = cursor.read_i32_le()
-        note_size = cursor.read_i32_le()
-        data_e_units_size = cursor.read_i32_le()
+        values = cursor.read_struct(BIN_HEADER_V5_STRUCT)
+        version, checksum, wfm_size, formula_size, note_size, data_e_units_size = (
+            values[:6]
+        )
 
-        dim_e_units_size = tuple(cursor.read_i32_le() for _ in range(4))
-        dim_labels_size = tuple(cursor.read_i32_le() for _ in range(4))
+        dim_e_units_size = values[6:10]
+        dim_labels_size = values[10:14]
 
-        s_indices_size = cursor.read_i32_le()
-        options_size_1 = cursor.read_i32_le()
-        options_size_2 = cursor.read_i32_le()
+        s_indices_size, options_size_1, options_size_2 = values[14:]
 
         return cls(
             version,
@@ -203,33 +214,37 @@ class WaveHeaderV2:
 
     @classmethod
     def from_buffer(cls, cursor: Cursor) -> Self:
-        type_ = cursor.read_i16_le()
-        next = cursor.read_u32_le()
-        bname = cursor.read_string(20)
-        wh_version = cursor.read_i16_le()
-        src_fldr = cursor.read_i16_le()
-        file_name = cursor.read_u32_le()
-        data_units = cursor.read_string(4)
-        x_units = cursor.read_string(4)
-        npnts = cursor.read_i32_le()
-        a_modified = cursor.read_i16_le()
-        hs_a = cursor.read_f64_le()
-        hs_b = cursor.read_f64_le()
-        w_modified = cursor.read_i16_le()
-        sw_modified = cursor.read_i16_le()
-        fs_valid = cursor.read_i16_le()
-        top_full_scale = cursor.read_f64_le()
-        bot_full_scale = cursor.read_f64_le()
-
-        use_bits = cursor.read_u8_le()
-        kind_bits = cursor.read_u8_le()
-
-        formula = cursor.read_u32_le()
-        dep_id = cursor.read_i32_le()
-        creation_date = cursor.read_u32_le()
-        w_unused = cursor.read_string(2)
-        mod_date = cursor.read_u32_le()
-        wave_note_h = cursor.read_u32_le()
+        (
+            type_,
+            next,
+            bname,
+            wh_version,
+            src_fldr,
+            file_name,
+            data_units,
+            x_units,
+            npnts,
+            a_modified,
+            hs_a,
+            hs_b,
+            w_modified,
+            sw_modified,
+            fs_valid,
+            top_full_scale,
+            bot_full_scale,
+            use_bits,
+            kind_bits,
+            formula,
+            dep_id,
+            creation_date,
+            w_unused,
+            mod_date,
+            wave_note_h,
+        ) = cursor.read_struct(WAVE_HEADER_V2_STRUCT)
+        bname = decode_string(bname)
+        data_units = decode_string(data_units)
+        x_units = decode_string(x_units)
+        w_unused = decode_string(w_unused)
 
         return cls(
             type_,
@@ -308,55 +323,53 @@ class WaveHeaderV5:
 
     @classmethod
     def from_buffer(cls, cursor: Cursor) -> Self:
-        next = cursor.read_u32_le()
-        creation_date = cursor.read_u32_le()
-        mod_date = cursor.read_u32_le()
-        npnts = cursor.read_i32_le()
-        type_ = cursor.read_i16_le()
-        d_lock = cursor.read_i16_le()
-        whpad1 = cursor.read_string(6)
-        wh_version = cursor.read_i16_le()
-        bname = cursor.read_string(32)
-        whpad2 = cursor.read_i32_le()
-        data_folder = cursor.read_u32_le()
-
-        n_dim = tuple(cursor.read_u32_le() for _ in range(4))
-        sf_a = tuple(cursor.read_f64_le() for _ in range(4))
-        sf_b = tuple(cursor.read_f64_le() for _ in range(4))
-
-        data_units = cursor.read_string(4)
-
-        dim_units = tuple(
-            tuple(cursor.read_u8_le() for _ in range(4)) for _ in range(4)
-        )
+        values = cursor.read_struct(WAVE_HEADER_V5_STRUCT)
+        (
+            next,
+            creation_date,
+            mod_date,
+            npnts,
+            type_,
+            d_lock,
+            whpad1,
+            wh_version,
+            bname,
+            whpad2,
+            data_folder,
+        ) = values[:11]
+        whpad1 = decode_string(whpad1)
+        bname = decode_string(bname)
 
-        fs_valid = cursor.read_i16_le()
-        whpad3 = cursor.read_i16_le()
-        top_full_scale = cursor.read_f64_le()
-        bot_full_scale = cursor.read_f64_le()
-        data_e_units = cursor.read_u32_le()
+        n_dim = values[11:15]
+        sf_a = values[15:19]
+        sf_b = values[19:23]
 
-        dim_e_units = tuple(cursor.read_u32_le() for _ in range(4))
-        dim_labels = tuple(cursor.read_u32_le() for _ in range(4))
+        data_units = decode_string(values[23])
 
-        wave_note_h = cursor.read_u32_le()
+        dim_units = tuple(values[24 + 4 * i : 28 + 4 * i] for i in range(4))
 
-        wh_unused = [cursor.read_i32_le() for _ in range(16)]
+        fs_valid, whpad3, top_full_scale, bot_full_scale, data_e_units = values[40:45]
 
-        a_modified = cursor.read_i16_le()
-        w_modified = cursor.read_i16_le()
-        sw_modified = cursor.read_i16_le()
+        dim_e_units = values[45:49]
+        dim_labels = values[49:53]
 
-        use_bits = cursor.read_u8_le()
+        wave_note_h = values[53]
 
-        kind_bits = cursor.read_u8_le()
+        wh_unused = list(values[54:70])
 
-        formula = cursor.read_u32_le()
-        dep_id = cursor.read_i32_le()
-        whpad4 = cursor.read_i16_le()
-        src_fldr = cursor.read_i16_le()
-        file_name = cursor.read_u32_le()
-        s_indeces = cursor.read_i32_le()
+        (
+            a_modified,
+            w_modified,
+            sw_modified,
+            use_bits,
+            kind_bits,
+            formula,
+            dep_id,
+            whpad4,
+            src_fldr,
+            file_name,
+            s_indeces,
+        ) = values[70:]
 
         return cls( next,
             creation_date,
@@ -416,37 +429,35 @@ class Ibw:
     dim_labels: list[str] | None
     data: list[float]
 
-    def __init__(self, filepath: str):
-        with open(filepath, "rb") as f:
-            cursor = Cursor(f)
-            wave = read_binary_wave(cursor)
-            wave_header = wave.wave_header
-
-            self.npnts = wave_header.npnts
-            self.data = wave.data
-            self.bname = wave_header.bname
-            self.creation_date = wave_header.creation_date
-            self.note = wave.note
-            self.extended_data_units = wave.extended_data_units
-            self.dim_e_units = wave.dim_e_units
-            self.dim_labels = wave.dim_labels
-
-            self.n_dim = (
-                wave_header.n_dim
-                if isinstance(wave_header, WaveHeaderV5)
-                else (wave_header.npnts, 0, 0, 0)
-            )
-            self.x_step = (
-                wave_header.sf_a
-                if isinstance(wave_header, WaveHeaderV5)
-                else (wave_header.hs_a, 0, 0, 0)
-            )
-            self.x_start = (
-                wave_header.sf_b
-                if isinstance(wave_header, WaveHeaderV5)
-                else (wave_header.hs_b, 0, 0, 0)
-            )
-            self.data_units = wave_header.data_units
+    def __init__(self, filepath: str, note_encoding: str = "latin-1"):
+        wave = read_ibw(filepath, note_encoding)
+        wave_header = wave.wave_header
+
+        self.npnts = wave_header.npnts
+        self.data = wave.data.tolist()
+        self.bname = wave_header.bname
+        self.creation_date = wave_header.creation_date
+        self.note = wave.note
+        self.extended_data_units = wave.extended_data_units
+        self.dim_e_units = wave.dim_e_units
+        self.dim_labels = wave.dim_labels
+
+        self.n_dim = (
+            wave_header.n_dim
+            if isinstance(wave_header, WaveHeaderV5)
+            else (wave_header.npnts, 0, 0, 0)
+        )
+        self.x_step = (
+            wave_header.sf_a
+            if isinstance(wave_header, WaveHeaderV5)
+            else (wave_header.hs_a, 0, 0, 0)
+        )
+        self.x_start = (
+            wave_header.sf_b
+            if isinstance(wave_header, WaveHeaderV5)
+            else (wave_header.hs_b, 0, 0, 0)
+        )
+        self.data_units = wave_header.data_units
 
     @override
     def __repr__(self) -> str:
@@ -460,33 +471,71 @@ class Ibw:
 class BinaryWave:
     bin_header: BinHeader
     wave_header: WaveHeader
-    note: str
+    raw_note: bytes
     extended_data_units: str
     dim_e_units: list[str]
     dim_labels: list[str]
-    data: list[float]
+    data: NDArray[np.generic]
+    note_encoding: str = "latin-1"
+
+    @cached_property
+    def note(self) -> str:
+        """The wave note, decoded on first access"""
+        return decode_note(self.raw_note, self.note_encoding)
+
 
+def read_wave_headers(cursor: Cursor) -> tuple[BinHeader, WaveHeader]:
+    """Read the bin header and the wave header at the current cursor position.
 
-def read_binary_wave(cursor: Cursor) -> BinaryWave:
+    Args:
+        cursor: Cursor positioned at the start of the bin header
+
+    Returns:
+        The bin header and the wave header, the cursor is left at the start
+        of the wave data
+    """
     # file_len = len(f)
     current_pos = cursor.position()
     version = cursor.read_i16_le()
     cursor.set_position(current_pos)
 
-    bin_header = None
-    wave_header = None
     match version:
         case 2:
-            bin_header = BinHeaderV2.from_buffer(cursor)
-            wave_header = WaveHeaderV2.from_buffer(cursor)
+            return BinHeaderV2.from_buffer(cursor), WaveHeaderV2.from_buffer(cursor)
         case 5:
-            bin_header = BinHeaderV5.from_buffer(cursor)
-            wave_header = WaveHeaderV5.from_buffer(cursor)
+            return BinHeaderV5.from_buffer(cursor), WaveHeaderV5.from_buffer(cursor)
         case _:
             raise ValueError("Not a version 2 or version 5 bin header or wave header")
 
+
+def read_binary_wave(
+    cursor: Cursor,
+    copy: bool = True,
+    note_encoding: str = "latin-1",
+    lazy_note: bool = False,
+) -> BinaryWave:
+    """Read a binary wave at the current cursor position.
+
+    Args:
+        cursor: Cursor positioned at the start of the bin header
+        copy: If True, the wave data is converted to a float64 array, or a
+            complex128 array for complex waves. If False, the data is kept in
+            its stored dtype, which is a read-only view into the buffer for
+            memory-mapped cursors.
+        note_encoding: The encoding of the wave note, e.g. "latin-1",
+            "mac_roman" or "utf-8"
+        lazy_note: If True, the note is only decoded when it is accessed
+
+    Returns:
+        The read binary wave
+    """
+    bin_header, wave_header = read_wave_headers(cursor)
+    version = bin_header.version
+
     # TODO reshape data maybe?
     data = read_numeric_data(cursor, wave_header.type_, wave_header.npnts)
+    if copy:
+        data = data.astype(np.complex128 if data.dtype.kind == "c" else np.float64)
 
     # Version 1, 2 and 3 have 16 bytes of padding after numeric wave data.
     if version in [1, 2, 3]:
@@ -499,28 +548,59 @@ def read_binary_wave(cursor: Cursor) -> BinaryWave:
     # v3: Wave note data, wave dependency formula
     # v5: Wave dependency formula, wave note data, extended data units data, extended dimension units data, dimension label data, String indices used for text waves only
 
-    note = read_note(cursor, bin_header.note_size)
+    raw_note = cursor.read(bin_header.note_size)
     extended_data_units = read_extended_data_units(cursor, bin_header)
     dim_e_units = read_dim_e_units(cursor, bin_header)
-    dim_labels = read_dim_labels(cursor, bin_header)
+    dim_labels = read_dim_labels(cursor, bin_header, wave_header)
 
-    return BinaryWave(
+    wave = BinaryWave(
         bin_header,
         wave_header,
-        note,
+        raw_note,
         extended_data_units,
         dim_e_units,
         dim_labels,
         data,
+        note_encoding,
     )
+    if not lazy_note:
+        _ = wave.note
+
+    return wave
+
+
+def read_ibw(
+    filepath: str, note_encoding: str = "latin-1", lazy_note: bool = False
+) -> BinaryWave:
+    """Read the wave of an Igor binary wave file (ibw).
+
+    Args:
+        filepath: Path to the ibw file
+        note_encoding: The encoding of the wave note
+        lazy_note: If True, the note is only decoded when it is accessed
+
+    Returns:
+        The read binary wave
+    """
+    with open(filepath, "rb") as f:
+        return read_binary_wave(Cursor(f.read()), note_encoding=note_encoding, lazy_note=lazy_note)
 
 
-def read_note(cursor: Cursor, note_size: int) -> str:
-    note = ""
-    if note_size != 0:
-        note = cursor.read_string(note_size).replace("\r", "\n")
+def decode_note(raw: bytes, encoding: str = "latin-1") -> str:
+    """Decode a wave note in one go.
 
-    return note
+    Igor separates the lines of notes with carriage returns, they are
+    converted to newlines. Bytes that are invalid in the encoding are
+    replaced, so a wrong encoding doesn't make a wave unreadable.
+
+    Args:
+        raw: The bytes of the note
+        encoding: The encoding of the note
+
+    Returns:
+        The decoded note
+    """
+    return raw.replace(b"\x00", b"").decode(encoding, errors="replace").replace("\r", "\n")
 
 
 def read_extended_data_units(cursor: Cursor, bin_header: BinHeader) -> str:
@@ -544,59 +624,98 @@ def read_dim_e_units(cursor: Cursor, bin_header: BinHeader) -> list[str]:
     return dim_e_units
 
 
-def read_dim_labels(cursor: Cursor, bin_header: BinHeader) -> list[str]:
+def read_dim_labels(
+    cursor: Cursor, bin_header: BinHeader, wave_header: WaveHeader
+) -> list[str]:
+    """Read the dimension labels of a wave.
+
+    A dimension with labels has a label for the dimension itself followed by
+    a label for each point, only the label of the dimension is kept.
+
+    Args:
+        cursor: Cursor positioned at the start of the dimension labels
+        bin_header: The bin header of the wave
+        wave_header: The wave header of the wave
+
+    Returns:
+        The label of each used dimension, empty for dimensions without labels
+    """
     # Original: Fixed length array of size 4.
     dim_labels: list[str] = []
-    if isinstance(bin_header, BinHeaderV5):
-        for i in bin_header.dim_e_units_size:
-            if i != 0:
-                dim_labels.append(cursor.read_string(i))
+    if isinstance(bin_header, BinHeaderV5) and isinstance(wave_header, WaveHeaderV5):
+        for size, n in zip(bin_header.dim_labels_size, wave_header.n_dim):
+            label = ""
+            if size != 0:
+                # the label of the dimension ends at the first NUL
+                label = cursor.read_string(size)
+            if n != 0 or label:
+                dim_labels.append(label)
 
     return dim_labels
 
 
-def read_numeric_data(
-    cursor: Cursor, data_type: int, num_data_points: int
-) -> list[float]:
-    data = None
+def numeric_dtype(data_type: int) -> np.dtype:
+    """Get the little-endian numpy dtype for an Igor numeric wave type.
+
+    Args:
+        data_type: The wave type (e.g. NT_FP32) as stored in the wave header
+
+    Returns:
+        The matching numpy dtype
+    """
     match data_type:
         case 0:
             raise NotImplementedError("Text Wave")
         case 1:
             raise NotImplementedError("Complex")
         case 2:
-            data = [cursor.read_f32_le() for _ in range(num_data_points)]
+            return np.dtype("<f4")
         case 3:
-            raise NotImplementedError("Complex 64")
+            return np.dtype("<c8")
         case 4:
-            data = [cursor.read_f64_le() for _ in range(num_data_points)]
+            return np.dtype("<f8")
         case 5:
-            raise NotImplementedError("Complex 128")
+            return np.dtype("<c16")
         case 8:
-            data = [cursor.read_i8_le() for _ in range(num_data_points)]
+            return np.dtype("<i1")
         case 9:
             raise NotImplementedError("Complex Int8")
         case 0x10:
-            data = [cursor.read_i16_le() for _ in range(num_data_points)]
+            return np.dtype("<i2")
         case 0x11:
             raise NotImplementedError("Complex Int16")
         case 0x20:
-            data = [cursor.read_i32_le() for _ in range(num_data_points)]
+            return np.dtype("<i4")
         case 0x21:
             raise NotImplementedError("Complex Int32")
         case 0x48:
-            data = [cursor.read_u8_le() for _ in range(num_data_points)]
+            return np.dtype("<u1")
         case 0x49:
             raise NotImplementedError("Complex UInt8")
         case 0x50:
-            data = [cursor.read_u16_le() for _ in range(num_data_points)]
+            return np.dtype("<u2")
         case 0x51:
             raise NotImplementedError("Complex UInt16 Data")
         case 0x60:
-            data = [cursor.read_u32_le() for _ in range(num_data_points)]
+            return np.dtype("<u4")
         case 0x61:
             raise NotImplementedError("Complex UInt32 Data")
         case _:
             raise ValueError("Unknown data type")
 
-    return [float(i) for i in data]
+
+def read_numeric_data(
+    cursor: Cursor, data_type: int, num_data_points: int
+) -> NDArray[np.generic]:
+    """Read the numeric payload of a wave in one go.
+
+    Args:
+        cursor: Cursor positioned at the start of the wave data
+        data_type: The wave type (e.g. NT_FP32) as stored in the wave header
+        num_data_points: Number of data points in the wave
+
+    Returns:
+        The wave data in its stored dtype, a view into the buffer if the
+        cursor is backed by a memory map
+    """
+    return cursor.read_array(numeric_dtype(data_type), num_data_points)
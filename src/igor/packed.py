@@ -1,9 +1,12 @@
+from collections.abc import Sequence
 from dataclasses import dataclass
+import mmap
 import os
+import sys
 from enum import Enum, auto
-from typing import Self
+from typing import BinaryIO, Self, overload
 
-from igor.cursor import Cursor
+from igor.cursor import Cursor, CursorError
 import igor.ibw
 
 
@@ -29,6 +32,10 @@ class PackedFileRecordType(Enum):
     kDataFolderEndRecord = auto()    # 10: Marks the end of a data folder.
 
 
+# Number of bytes of a PackedFileRecordHeader
+RECORD_HEADER_SIZE = 8
+
+
 @dataclass
 class PackedFileRecordHeader:
     record_type: int  # u16
@@ -188,58 +195,306 @@ class UserDependentVarRec:
         return cls(name, type_, num, formula_len, formula)
 
 
+def map_file(filepath: str) -> mmap.mmap:
+    """Map a file read-only into memory.
+
+    Args:
+        filepath: Path to the file
+
+    Returns:
+        The memory map of the whole file
+    """
+    with open(filepath, "rb") as f:
+        if sys.version_info >= (3, 13):
+            # Don't keep a duplicated file descriptor open for every mapping
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ, trackfd=False)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+@dataclass
+class WaveRecordIndex:
+    """Entry of the wave record index of a packed file.
+
+    Args:
+        offset: Byte-position of the wave's bin header in the file.
+        size: Number of bytes of the wave record.
+        name: Name of the wave.
+        type_: See types (e.g. NT_FP64).
+        npnts: Number of data points in wave.
+        n_dim: Number of points in each dimension, 0 for unused dimensions.
+    """
+
+    offset: int
+    size: int
+    name: str
+    type_: int
+    npnts: int
+    n_dim: tuple[int, int, int, int]
+
+    @classmethod
+    def from_wave_header(
+        cls, offset: int, size: int, wave_header: igor.ibw.WaveHeader
+    ) -> Self:
+        n_dim = (
+            wave_header.n_dim
+            if isinstance(wave_header, igor.ibw.WaveHeaderV5)
+            else (wave_header.npnts, 0, 0, 0)
+        )
+        return cls(
+            offset,
+            size,
+            wave_header.bname,
+            wave_header.type_,
+            wave_header.npnts,
+            n_dim,
+        )
+
+
+class LazyRecords(Sequence[igor.ibw.BinaryWave]):
+    """The wave records of a lazily loaded packed file.
+
+    A wave is decoded when it is accessed for the first time.
+    """
+
+    def __init__(self, packed_file: "PackedFile"):
+        self._packed_file = packed_file
+        self._waves: dict[int, igor.ibw.BinaryWave] = {}
+
+    def __len__(self) -> int:
+        return len(self._packed_file.index)
+
+    @overload
+    def __getitem__(self, key: int) -> igor.ibw.BinaryWave: ...
+
+    @overload
+    def __getitem__(self, key: slice) -> list[igor.ibw.BinaryWave]: ...
+
+    def __getitem__(
+        self, key: int | slice
+    ) -> igor.ibw.BinaryWave | list[igor.ibw.BinaryWave]:
+        if isinstance(key, slice):
+            return [self[i] for i in range(*key.indices(len(self)))]
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("record index out of range")
+
+        if key not in self._waves:
+            self._waves[key] = self._packed_file.read_wave(self._packed_file.index[key])
+        return self._waves[key]
+
+    def clear(self) -> None:
+        """Forget the decoded waves"""
+        self._waves.clear()
+
+
 class PackedFile:
-    def __init__(self, filepath: str):
-        self.records: list[igor.ibw.BinaryWave] = []
-        with open(filepath, "rb") as f:
-            file_size = os.path.getsize(filepath)
-            cursor = Cursor(f)
-
-            while cursor.position() < file_size:
-                file_record_header = PackedFileRecordHeader.from_buffer(cursor)
-                # print(f"{file_record_header=}")
-
-                match PackedFileRecordType(file_record_header.record_type):
-                    # case PackedFileRecordType.kVariablesRecord:
-                    #     version = cursor.read_i16_le()
-                    #     print(f"{version=}")
-                    #     cursor.set_position(cursor.position() - 2)
-                    #
-                    #     match version:
-                    #         case 1:
-                    #             var_header = VarHeader1.from_buffer(cursor)
-                    #         case 2:
-                    #             var_header = VarHeader2.from_buffer(cursor)
-                    #         case _:
-                    #             raise ValueError(f"Unknown VarHeader version: {version}")
-                    #
-                    #     print(f"{var_header=}")
-                    #     sys_vars = [cursor.read_f32_le() for _ in range(var_header.num_sys_vars)]
-                    #     user_vars = [UserNumVarRec.from_buffer(cursor) for _ in range(var_header.num_user_vars)]
-                    #
-                    #     user_strs: list[UserStrVarRec1 | UserStrVarRec2] = []
-                    #     for _ in range(var_header.num_user_strs):
-                    #         match version:
-                    #             case 1:
-                    #                 user_str = UserStrVarRec1.from_buffer(cursor)
-                    #             case 2:
-                    #                 user_str = UserStrVarRec2.from_buffer(cursor)
-                    #
-                    #         user_strs.append(user_str)
-                    #
-                    #     if isinstance(var_header, VarHeader2):
-                    #         user_dependent_vars = [UserDependentVarRec.from_buffer(cursor) for _ in range(var_header.num_dependent_vars)]
-                    #         user_dependent_strs = [UserDependentVarRec.from_buffer(cursor) for _ in range(var_header.num_dependent_strs)]
-                    #
-                    #
-                    # case PackedFileRecordType.kHistoryRecord:
-                    #     history_record = cursor.read_string(file_record_header.num_data_bytes)
-
-                    case PackedFileRecordType.kWaveRecord:
-                        position = cursor.position()
-                        wave_record = igor.ibw.read_binary_wave(cursor)
-                        self.records.append(wave_record)
-                        cursor.set_position(position + file_record_header.num_data_bytes)
-
-                    case _:
-                        cursor.set_position(cursor.position() + file_record_header.num_data_bytes)
+    """Class representing an Igor packed experiment file (pxt).
+
+    Args:
+        filepath: Path to the packed experiment file
+        memory_map: If True, the file is mapped into memory instead of read
+            and the data of the records are read-only views into the mapping
+            in their stored dtype. The mapping is released by `close` (or
+            at the end of a `with` block), or once the PackedFile and all of
+            its data arrays are garbage collected.
+        lazy: If True, only the record headers are parsed on construction and
+            `index` is filled, the wave data are not read. A wave is decoded when it is first accessed
+            through `records` or `wave`.
+        note_encoding: The encoding of the wave notes, e.g. "latin-1",
+            "mac_roman" or "utf-8"
+        lazy_notes: If True, the note of a wave is only decoded when it is
+            accessed
+
+    Attributes:
+        bytes_parsed: Number of bytes read on construction, the record headers
+            and the whole wave records, or only their headers if `lazy`.
+    """
+
+    def __init__(
+        self,
+        filepath: str,
+        memory_map: bool = False,
+        lazy: bool = False,
+        note_encoding: str = "latin-1",
+        lazy_notes: bool = False,
+    ):
+        self.filepath = filepath
+        self.note_encoding = note_encoding
+        self.lazy_notes = lazy_notes
+        self.index: list[WaveRecordIndex] = []
+        self.bytes_parsed = 0
+        self.records: Sequence[igor.ibw.BinaryWave]
+        self._mapping = map_file(filepath) if memory_map else None
+        self._closed = False
+
+        if self._mapping is not None:
+            waves = self._parse(Cursor(self._mapping), not lazy)
+        elif lazy:
+            waves = []
+            with open(filepath, "rb") as f:
+                self._index_file(f)
+        else:
+            with open(filepath, "rb") as f:
+                waves = self._parse(Cursor(f.read()), not lazy)
+
+        self.records = LazyRecords(self) if lazy else waves
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map of the file
+
+        Waves that were read from the mapping and are still referenced keep it
+        alive, it is unmapped once the last of them is deleted. Lazily loaded
+        waves can't be read anymore.
+        """
+        self._closed = True
+        if isinstance(self.records, LazyRecords):
+            self.records.clear()
+        mapping, self._mapping = self._mapping, None
+        if mapping is None:
+            return
+        try:
+            mapping.close()
+        except BufferError:
+            # the data of waves still in use are views of the mapping
+            pass
+
+    def wave(self, name: str) -> igor.ibw.BinaryWave:
+        """Get a wave by its name
+
+        Args:
+            name: Name of the wave
+
+        Returns:
+            The wave
+        """
+        for i, entry in enumerate(self.index):
+            if entry.name == name:
+                return self.records[i]
+
+        raise KeyError(f"No wave named {name!r} in {self.filepath}")
+
+    def read_wave(self, entry: WaveRecordIndex) -> igor.ibw.BinaryWave:
+        """Decode a wave record of the file
+
+        Args:
+            entry: Index entry of the wave record
+
+        Returns:
+            The decoded wave
+        """
+        if self._closed:
+            raise ValueError(f"{self.filepath} is closed")
+        if self._mapping is not None:
+            return self._read_binary_wave(Cursor(self._mapping, entry.offset))
+
+        with open(self.filepath, "rb") as f:
+            _ = f.seek(entry.offset)
+            return self._read_binary_wave(Cursor(f.read(entry.size)))
+
+    def _read_binary_wave(self, cursor: Cursor) -> igor.ibw.BinaryWave:
+        return igor.ibw.read_binary_wave(
+            cursor,
+            copy=self._mapping is None,
+            note_encoding=self.note_encoding,
+            lazy_note=self.lazy_notes,
+        )
+
+    def _index_file(self, f: BinaryIO) -> None:
+        """Fill the index by reading only the record headers and wave headers of the file"""
+        size = os.fstat(f.fileno()).st_size
+        record_start = 0
+        while record_start < size:
+            _ = f.seek(record_start)
+            cursor = Cursor(f.read(RECORD_HEADER_SIZE))
+            file_record_header = PackedFileRecordHeader.from_buffer(cursor)
+            position = record_start + RECORD_HEADER_SIZE
+            if position + file_record_header.num_data_bytes > size:
+                raise CursorError(position, file_record_header.num_data_bytes, size)
+
+            self.bytes_parsed += RECORD_HEADER_SIZE
+            if PackedFileRecordType(file_record_header.record_type) == PackedFileRecordType.kWaveRecord:
+                cursor = Cursor(
+                    f.read(min(file_record_header.num_data_bytes, igor.ibw.MAX_WAVE_HEADERS_SIZE))
+                )
+                _, wave_header = igor.ibw.read_wave_headers(cursor)
+                self.bytes_parsed += cursor.position()
+                self.index.append(
+                    WaveRecordIndex.from_wave_header(
+                        position, file_record_header.num_data_bytes, wave_header
+                    )
+                )
+            record_start = position + file_record_header.num_data_bytes
+
+    def _parse(self, cursor: Cursor, decode: bool) -> list[igor.ibw.BinaryWave]:
+        waves: list[igor.ibw.BinaryWave] = []
+        while cursor.position() < len(cursor):
+            record_start = cursor.position()
+            file_record_header = PackedFileRecordHeader.from_buffer(cursor)
+            self.bytes_parsed += cursor.position() - record_start
+            # print(f"{file_record_header=}")
+
+            match PackedFileRecordType(file_record_header.record_type):
+                # case PackedFileRecordType.kVariablesRecord:
+                #     version = cursor.read_i16_le()
+                #     print(f"{version=}")
+                #     cursor.set_position(cursor.position() - 2)
+                #
+                #     match version:
+                #         case 1:
+                #             var_header = VarHeader1.from_buffer(cursor)
+                #         case 2:
+                #             var_header = VarHeader2.from_buffer(cursor)
+                #         case _:
+                #             raise ValueError(f"Unknown VarHeader version: {version}")
+                #
+                #     print(f"{var_header=}")
+                #     sys_vars = [cursor.read_f32_le() for _ in range(var_header.num_sys_vars)]
+                #     user_vars = [UserNumVarRec.from_buffer(cursor) for _ in range(var_header.num_user_vars)]
+                #
+                #     user_strs: list[UserStrVarRec1 | UserStrVarRec2] = []
+                #     for _ in range(var_header.num_user_strs):
+                #         match version:
+                #             case 1:
+                #                 user_str = UserStrVarRec1.from_buffer(cursor)
+                #             case 2:
+                #                 user_str = UserStrVarRec2.from_buffer(cursor)
+                #
+                #         user_strs.append(user_str)
+                #
+                #     if isinstance(var_header, VarHeader2):
+                #         user_dependent_vars = [UserDependentVarRec.from_buffer(cursor) for _ in range(var_header.num_dependent_vars)]
+                #         user_dependent_strs = [UserDependentVarRec.from_buffer(cursor) for _ in range(var_header.num_dependent_strs)]
+                #
+                #
+                # case PackedFileRecordType.kHistoryRecord:
+                #     history_record = cursor.read_string(file_record_header.num_data_bytes)
+
+                case PackedFileRecordType.kWaveRecord:
+                    position = cursor.position()
+                    if decode:
+                        wave_record = self._read_binary_wave(cursor)
+                        waves.append(wave_record)
+                        wave_header = wave_record.wave_header
+                    else:
+                        _, wave_header = igor.ibw.read_wave_headers(cursor)
+                    self.bytes_parsed += cursor.position() - position
+
+                    self.index.append(
+                        WaveRecordIndex.from_wave_header(
+                            position, file_record_header.num_data_bytes, wave_header
+                        )
+                    )
+                    cursor.set_position(position + file_record_header.num_data_bytes)
+
+                case _:
+                    cursor.set_position(cursor.position() + file_record_header.num_data_bytes)
+
+        return waves
@@ -0,0 +1,222 @@
+from collections.abc import Iterable, Sequence
+import struct
+
+import numpy as np
+from numpy.typing import ArrayLike
+
+from igor.ibw import BIN_HEADER_V5_STRUCT, MAX_DIM_LABEL_CHARS, WAVE_HEADER_V5_STRUCT
+from igor.packed import PackedFileRecordType
+
+RECORD_HEADER_STRUCT = struct.Struct("<Hhi")
+
+# Maximum number of characters of wave names and units in the wave header
+MAX_WAVE_NAME = 31
+MAX_UNIT = 3
+
+EncodedWave = list[memoryview]
+
+
+def wave_type(dtype: np.dtype) -> int:
+    """Get the Igor numeric wave type for a numpy dtype.
+
+    Args:
+        dtype: The dtype of the wave data
+
+    Returns:
+        The wave type (e.g. NT_FP32) to store in the wave header
+    """
+    match np.dtype(dtype).newbyteorder("<").str:
+        case "<f4":
+            return 2
+        case "<c8":
+            return 3  # NT_CMPLX | NT_FP32
+        case "<f8":
+            return 4
+        case "<c16":
+            return 5  # NT_CMPLX | NT_FP64
+        case "|i1":
+            return 8
+        case "<i2":
+            return 0x10
+        case "<i4":
+            return 0x20
+        case "|u1":
+            return 0x48
+        case "<u2":
+            return 0x50
+        case "<u4":
+            return 0x60
+        case _:
+            raise ValueError(f"No Igor wave type for dtype {dtype}")
+
+
+def wave_checksum(headers: bytes) -> int:
+    """Calculate the checksum of the bin header and the wave header.
+
+    Igor checks that the 16-bit sum over both headers is zero.
+
+    Args:
+        headers: The packed headers, written with a checksum of zero
+
+    Returns:
+        The checksum to store in the bin header
+    """
+    total = int(np.frombuffer(headers, dtype="<i2").sum(dtype=np.int64))
+    return (0x8000 - total) % 0x10000 - 0x8000
+
+
+def pack_string(value: str, max_length: int, what: str) -> bytes:
+    encoded = value.encode("latin-1")
+    if len(encoded) > max_length:
+        raise ValueError(f"{what} {value!r} is longer than {max_length} characters")
+    return encoded
+
+
+def encode_binary_wave(
+    data: ArrayLike,
+    name: str,
+    *,
+    note: str = "",
+    start: Sequence[float] = (0, 0, 0, 0),
+    step: Sequence[float] = (1, 1, 1, 1),
+    data_units: str = "",
+    extended_data_units: str = "",
+    dim_e_units: Sequence[str] = (),
+    dim_labels: Sequence[str] = (),
+    creation_date: int = 0,
+    note_encoding: str = "latin-1",
+) -> EncodedWave:
+    """Encode a version 5 binary wave.
+
+    The wave data is stored in the column-major order of Igor, so the axes of
+    `data` are the rows, columns, layers and chunks of the wave. The data is
+    not copied if it is already a contiguous little-endian array in that
+    order.
+
+    Args:
+        data: The wave data with up to 4 dimensions, in a numeric dtype
+        name: Name of the wave
+        note: The wave note
+        start: Start value of the scaling of each dimension
+        step: Step value of the scaling of each dimension
+        data_units: Data units of up to 3 characters stored in the wave header
+        extended_data_units: Data units of any length
+        dim_e_units: Units of any length for each dimension, starting with
+            the rows
+        dim_labels: Label for each dimension, starting with the rows
+        creation_date: DateTime of creation in seconds since 1904
+        note_encoding: The encoding of the note
+
+    Returns:
+        The buffers of the encoded wave in file order
+    """
+    array = np.asarray(data)
+    if not 1 <= array.ndim <= 4:
+        raise ValueError(f"Waves have 1 to 4 dimensions, got {array.ndim}")
+    type_ = wave_type(array.dtype)
+    payload = np.ravel(array, order="F").astype(array.dtype.newbyteorder("<"), copy=False)
+    n_dim = array.shape + (0,) * (4 - array.ndim)
+
+    note_bytes = note.replace("\n", "\r").encode(note_encoding)
+    data_e_units_bytes = extended_data_units.encode("latin-1")
+    dim_e_units_bytes = [units.encode("latin-1") for units in dim_e_units]
+    dim_e_units_bytes += [b""] * (4 - len(dim_e_units_bytes))
+
+    # each dimension with a label has a label for the dimension and one for
+    # each point (left empty here)
+    dim_labels_bytes: list[bytes] = []
+    for label, n in zip(list(dim_labels) + [""] * (4 - len(dim_labels)), n_dim):
+        encoded = pack_string(label, MAX_DIM_LABEL_CHARS, "Dimension label")
+        dim_labels_bytes.append(
+            encoded.ljust((n + 1) * (MAX_DIM_LABEL_CHARS + 1), b"\x00") if encoded else b""
+        )
+
+    wave_header = WAVE_HEADER_V5_STRUCT.pack(
+        0,  # next
+        creation_date,
+        creation_date,  # mod_date
+        array.size,
+        type_,
+        0,  # d_lock
+        b"",  # whpad1
+        1,  # wh_version
+        pack_string(name, MAX_WAVE_NAME, "Wave name"),
+        0,  # whpad2
+        0,  # data_folder
+        *n_dim,
+        *(list(step) + [1] * (4 - len(step))),
+        *(list(start) + [0] * (4 - len(start))),
+        pack_string(data_units, MAX_UNIT, "Data units"),
+        *([0] * 16),  # dim_units
+        0,  # fs_valid
+        0,  # whpad3
+        0.0,  # top_full_scale
+        0.0,  # bot_full_scale
+        *([0] * 37),  # handles, unused and in-memory only fields
+    )
+    bin_header_fields = [
+        5,  # version
+        0,  # checksum
+        len(wave_header) + payload.nbytes,  # wfm_size
+        0,  # formula_size
+        len(note_bytes),
+        len(data_e_units_bytes),
+        *(len(units) for units in dim_e_units_bytes),
+        *(len(labels) for labels in dim_labels_bytes),
+        0,  # s_indices_size
+        0,  # options_size_1
+        0,  # options_size_2
+    ]
+    bin_header_fields[1] = wave_checksum(
+        BIN_HEADER_V5_STRUCT.pack(*bin_header_fields) + wave_header
+    )
+    bin_header = BIN_HEADER_V5_STRUCT.pack(*bin_header_fields)
+
+    buffers = [bin_header, wave_header, payload, note_bytes, data_e_units_bytes]
+    buffers += dim_e_units_bytes + dim_labels_bytes
+    return [memoryview(buffer).cast("B") for buffer in buffers]
+
+
+def encoded_size(wave: EncodedWave) -> int:
+    """Get the number of bytes of an encoded wave.
+
+    Args:
+        wave: The encoded wave
+
+    Returns:
+        The number of bytes
+    """
+    return sum(buffer.nbytes for buffer in wave)
+
+
+def write_ibw(filepath: str, wave: EncodedWave) -> None:
+    """Write an Igor binary wave file (ibw).
+
+    Args:
+        filepath: Path to the ibw file
+        wave: The wave, see `encode_binary_wave`
+    """
+    with open(filepath, "wb") as f:
+        for buffer in wave:
+            _ = f.write(buffer)
+
+
+def write_packed_file(filepath: str, waves: Iterable[EncodedWave]) -> None:
+    """Write an Igor packed experiment file (pxt) with one record per wave.
+
+    The waves are written as they are generated, so files larger than the
+    memory can be written from an iterator.
+
+    Args:
+        filepath: Path to the packed experiment file
+        waves: The waves, see `encode_binary_wave`
+    """
+    with open(filepath, "wb") as f:
+        for wave in waves:
+            _ = f.write(
+                RECORD_HEADER_STRUCT.pack(
+                    PackedFileRecordType.kWaveRecord.value, 0, encoded_size(wave)
+                )
+            )
+            for buffer in wave:
+                _ = f.write(buffer)
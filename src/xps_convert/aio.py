@@ -0,0 +1,152 @@
+import asyncio
+import dataclasses
+import functools
+import uuid
+from collections.abc import Iterable
+from concurrent.futures import Executor, ThreadPoolExecutor
+from pathlib import Path
+
+from xps_convert.igor_to_kolxpd import IGOR_SAMPLE_PATTERN
+from xps_convert.conversion import Conversion, OutputFormat, plan_conversions, write_conversion
+
+
+@functools.cache
+def default_executor() -> ThreadPoolExecutor:
+    """The thread pool shared by all converters without an executor"""
+    return ThreadPoolExecutor(thread_name_prefix="xps-convert")
+
+
+class AsyncConverter:
+    """
+    Converts files without blocking the event loop.
+
+    Parsing, formatting and writing run in `executor`, the event loop only
+    waits for them. A `ProcessPoolExecutor` avoids contention for the GIL
+    between the conversions and the event loop, with None a shared thread
+    pool is used.
+
+    Cancelling a conversion that did not start yet removes it from the
+    executor. A conversion that is already running can't be interrupted, it
+    finishes in the background but its output is discarded. Either way the
+    output file is left untouched, as it is only replaced once a conversion
+    has completed.
+
+    Args:
+        executor: Runs the conversions
+        limit: Maximum number of conversions running at the same time,
+            unlimited if None
+        group_pattern: See `plan_conversions`
+        output_format: See `plan_conversions`
+    """
+
+    def __init__(
+        self,
+        executor: Executor | None = None,
+        limit: int | None = None,
+        group_pattern: str = IGOR_SAMPLE_PATTERN,
+        output_format: OutputFormat = OutputFormat.exp,
+    ):
+        if limit is not None and limit < 1:
+            raise ValueError(f"limit must be at least 1, not {limit}")
+        self.executor = executor
+        self.limit = limit
+        self.group_pattern = group_pattern
+        self.output_format = OutputFormat(output_format)
+        self._semaphore: asyncio.Semaphore | None = None
+
+    @property
+    def semaphore(self) -> asyncio.Semaphore | None:
+        # created on first use, within the running event loop
+        if self.limit is not None and self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        return self._semaphore
+
+    async def run(self, conversion: Conversion) -> Path:
+        """Run a conversion, see `plan_conversions`. Returns the output file."""
+        if self.semaphore is None:
+            return await self._run(conversion)
+        async with self.semaphore:
+            return await self._run(conversion)
+
+    async def _run(self, conversion: Conversion) -> Path:
+        # unique, so that a cancelled conversion that still runs can't
+        # clash with a new conversion into the same output file
+        out_file = conversion.out_file
+        part_file = out_file.with_name(f"{out_file.name}.{uuid.uuid4().hex}.part")
+        executor = default_executor() if self.executor is None else self.executor
+        future = executor.submit(write_conversion, conversion, part_file)
+        try:
+            await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # a running conversion still writes part_file
+            future.add_done_callback(lambda _: part_file.unlink(missing_ok=True))
+            raise
+        except BaseException:
+            # a failed conversion leaves what it wrote behind
+            part_file.unlink(missing_ok=True)
+            raise
+
+        try:
+            _ = await asyncio.to_thread(part_file.replace, out_file)
+        except BaseException:
+            part_file.unlink(missing_ok=True)
+            raise
+        return out_file
+
+    async def convert_file(self, path: Path, out_file: Path | None = None) -> Path:
+        """
+        Convert a single file. A .pxt/.ibw file is converted on its own into
+        a file named after it, not into the file of its sample, use
+        `convert_files` to convert all files of a sample into one file.
+
+        Args:
+            path: The .xy, .pxt or .ibw file to convert
+            out_file: The file to write, by default next to `path` with the
+                suffix of the output format
+
+        Returns:
+            The output file.
+        """
+        conversions = await asyncio.to_thread(
+            plan_conversions, [path], self.group_pattern, self.output_format
+        )
+        if not conversions:
+            raise ValueError(f"{path} is not a file that can be converted")
+
+        conversion = conversions[0]
+        if conversion.is_igor:
+            suffix = f".{self.output_format.value}"
+            conversion = Conversion(path.stem, [path], path.with_suffix(suffix))
+        if out_file is not None:
+            conversion = dataclasses.replace(conversion, out_file=out_file)
+        return await self.run(conversion)
+
+    async def convert_files(self, files: Iterable[Path]) -> list[Path | BaseException]:
+        """
+        Convert files concurrently, grouped like the command line does (see
+        `plan_conversions`). Returns the output file of each conversion, or
+        the exception it failed with.
+        """
+        conversions = await asyncio.to_thread(
+            plan_conversions, list(files), self.group_pattern, self.output_format
+        )
+        return await asyncio.gather(
+            *(self.run(conversion) for conversion in conversions), return_exceptions=True
+        )
+
+
+async def convert_file(
+    path: Path,
+    out_file: Path | None = None,
+    *,
+    executor: Executor | None = None,
+    group_pattern: str = IGOR_SAMPLE_PATTERN,
+    output_format: OutputFormat = OutputFormat.exp,
+) -> Path:
+    """
+    Convert a single file without blocking the event loop, see
+    `AsyncConverter`. To limit the number of concurrent conversions, share
+    an `AsyncConverter` instead.
+    """
+    converter = AsyncConverter(executor, None, group_pattern, output_format)
+    return await converter.convert_file(path, out_file)
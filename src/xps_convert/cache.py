@@ -0,0 +1,98 @@
+import hashlib
+import json
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any
+
+# Name of the manifest file, one per output folder
+MANIFEST_NAME = ".xps-convert-manifest.json"
+
+
+def converter_version() -> str:
+    try:
+        return version("xps-convert")
+    except PackageNotFoundError:
+        return "unknown"
+
+
+def hash_inputs(files: list[Path]) -> dict[str, str]:
+    """Get the SHA-256 hex digests of files, keyed by file name."""
+    hashes: dict[str, str] = {}
+    for file in files:
+        with open(file, "rb") as f:
+            hashes[file.name] = hashlib.file_digest(f, "sha256").hexdigest()
+    return hashes
+
+
+class ConversionCache:
+    """
+    Persistent manifest of the conversions into one output folder.
+
+    For each output file the manifest stores the hashes of its input files,
+    the converter version and the options it was converted with. A conversion
+    whose entry matches all of these and whose output file still exists does
+    not need to be repeated. Input files are expected in the same folder as
+    the manifest. Entries whose input files don't exist anymore are evicted
+    when the manifest is loaded.
+    """
+
+    def __init__(self, folder: Path):
+        self.path = folder / MANIFEST_NAME
+        self.entries: dict[str, dict[str, Any]] = {}
+        self.modified = False
+        if self.path.is_file():
+            try:
+                with open(self.path) as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                # a broken manifest only costs a reconversion
+                self.entries = {}
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove the entries of conversions whose input files don't exist anymore"""
+        folder = self.path.parent
+        entries = {
+            out_name: entry
+            for out_name, entry in self.entries.items()
+            if all((folder / name).is_file() for name in entry["inputs"])
+        }
+        if len(entries) != len(self.entries):
+            self.entries = entries
+            self.modified = True
+
+    def is_fresh(
+        self, out_file: Path, inputs: dict[str, str], options: dict[str, Any]
+    ) -> bool:
+        """
+        Check whether out_file was converted from the same inputs (see
+        `hash_inputs`), with the same options and converter version.
+        """
+        entry = self.entries.get(out_file.name)
+        return (
+            entry is not None
+            and out_file.is_file()
+            and entry["inputs"] == inputs
+            and entry["version"] == converter_version()
+            and entry["options"] == options
+        )
+
+    def record(
+        self, out_file: Path, inputs: dict[str, str], options: dict[str, Any]
+    ) -> None:
+        """Record a successful conversion into out_file"""
+        self.entries[out_file.name] = {
+            "inputs": inputs,
+            "version": converter_version(),
+            "options": options,
+        }
+        self.modified = True
+
+    def save(self) -> None:
+        """Write the manifest, if it has changed since it was loaded"""
+        if not self.modified:
+            return
+
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+        self.modified = False
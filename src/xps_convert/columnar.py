@@ -0,0 +1,217 @@
+import struct
+import zipfile
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+import numpy as np
+from numpy.typing import NDArray
+
+from igor.ibw import BinaryWave, WaveHeaderV5
+from xps_convert.igor_to_kolxpd import iter_waves, open_packed_file
+from xps_convert.profiling import FileProfile, NullFileProfile, Profile, file_profile
+from xps_convert.ses import parse_ses_note
+from xps_convert.specs_xy_to_kolxpd import index_xy_file, iter_xy_regions
+
+# Metadata columns of the columnar format, one row per spectrum
+COLUMNS = ("sample", "region", "cycle", "scan", "start", "step", "pass_energy")
+
+# Fixed part of a local file header of a zip archive
+ZIP_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+@dataclass
+class Spectrum:
+    """A single spectrum with its metadata.
+
+    Args:
+        sample: Name of the sample, the group for Prodigy XY files.
+        region: Name of the region.
+        cycle: Cycle of the spectrum, starting at 1, 0 if not cycled.
+        scan: Scan of the spectrum, starting at 1, 0 if not separated.
+        start: Energy of the first point.
+        step: Energy step between points.
+        pass_energy: Pass energy, NaN if unknown.
+        values: The counts.
+    """
+
+    sample: str
+    region: str
+    cycle: int
+    scan: int
+    start: float
+    step: float
+    pass_energy: float
+    values: NDArray[np.generic]
+
+
+def igor_spectra(
+    sample_name: str, sample_files: list[Path], profile: Profile | None = None
+) -> Iterator[Spectrum]:
+    """
+    Get the spectra of all waves of sample_files (.pxt or .ibw), every
+    column of a 2D wave is a cycle. The time spent reading each file is
+    recorded in `profile`, if passed.
+    """
+    print(f"Converting {sample_name}")
+    for file in sample_files:
+        ptx = open_packed_file(file, file_profile(profile, file))
+        try:
+            for wave in iter_waves(file, ptx, file_profile(profile, file)):
+                yield from wave_spectra(sample_name, wave)
+        finally:
+            if ptx is not None:
+                ptx.close()
+
+
+def wave_spectra(sample_name: str, wave: BinaryWave) -> Iterator[Spectrum]:
+    """Get the spectra of a wave, every column of a 2D wave is a cycle"""
+    header = wave.wave_header
+    assert isinstance(header, WaveHeaderV5)
+    pass_energy = parse_ses_note(wave.note).pass_energy
+    rows, columns = header.n_dim[0], header.n_dim[1]
+    data = wave.data.reshape(max(columns, 1), rows)
+    for i, values in enumerate(data):
+        yield Spectrum(
+            sample_name,
+            header.bname,
+            i + 1 if columns else 0,
+            0,
+            header.sf_b[0],
+            header.sf_a[0],
+            np.nan if pass_energy is None else pass_energy,
+            values,
+        )
+
+
+def xy_spectra(source_file: Path, profile: FileProfile | None = None) -> Iterator[Spectrum]:
+    """
+    Get the spectra of an XY file exported from SpecsLab Prodigy. The time
+    spent reading the file is recorded in `profile`, if passed.
+    """
+    print(f"Converting {source_file}")
+    if profile is None:
+        profile = NullFileProfile()
+    with profile.stage("header parse") as stats:
+        index = index_xy_file(source_file)
+        stats.bytes_read += source_file.stat().st_size
+
+    regions = iter_xy_regions(source_file, index)
+    for _ in range(sum(len(group.regions) for group in index.groups)):
+        # the spectra are yielded outside of the stage, their consumer is
+        # not timed as decoding
+        with profile.stage("data decode") as stats:
+            region = next(regions)
+            stats.points += sum(
+                len(block.data) for blocks in region.data_per_cycle.values() for block in blocks
+            )
+        try:
+            pass_energy = float(region.header_parameters.get("PassEn", "nan"))
+        except ValueError:
+            pass_energy = np.nan
+        for data_blocks in region.data_per_cycle.values():
+            for block in data_blocks:
+                energies = block.data[:, 0]
+                step = (energies[-1] - energies[0]) / (len(energies) - 1) if len(energies) > 1 else 0.0
+                yield Spectrum(
+                    region.group,
+                    region.header_parameters["Title"],
+                    block.cycle,
+                    block.scan or 0,
+                    energies[0],
+                    step,
+                    pass_energy,
+                    block.data[:, 1],
+                )
+
+    with profile.stage("data decode") as stats:
+        # the regions were read in one more pass over the file
+        stats.bytes_read += source_file.stat().st_size
+
+
+def write_columnar(file: Path | BinaryIO, spectra: Iterable[Spectrum], compress: bool = False) -> None:
+    """
+    Write spectra to a .npz file. The counts of all spectra are concatenated
+    into the float64 array `values`, spectrum i is
+    `values[offsets[i]:offsets[i + 1]]`. The metadata are stored as one
+    array per column (see COLUMNS). Uncompressed files can be memory mapped
+    with `ColumnarSpectra`.
+    """
+    columns: dict[str, list[object]] = {name: [] for name in COLUMNS}
+    values: list[NDArray[np.generic]] = []
+    for spectrum in spectra:
+        for name in COLUMNS:
+            columns[name].append(getattr(spectrum, name))
+        values.append(spectrum.values)
+
+    arrays = {
+        "values": np.concatenate(values, dtype=np.float64) if values else np.zeros(0),
+        "offsets": np.cumsum([0] + [len(v) for v in values], dtype=np.int64),
+        "sample": np.array(columns["sample"], dtype=str),
+        "region": np.array(columns["region"], dtype=str),
+        "cycle": np.array(columns["cycle"], dtype=np.int32),
+        "scan": np.array(columns["scan"], dtype=np.int32),
+        "start": np.array(columns["start"], dtype=np.float64),
+        "step": np.array(columns["step"], dtype=np.float64),
+        "pass_energy": np.array(columns["pass_energy"], dtype=np.float64),
+    }
+    if compress:
+        np.savez_compressed(file, **arrays)  # pyright: ignore[reportArgumentType]
+    else:
+        np.savez(file, **arrays)  # pyright: ignore[reportArgumentType]
+
+
+def map_npz_member(mapping: NDArray[np.uint8], f: BinaryIO, info: zipfile.ZipInfo) -> np.ndarray:
+    """Get an uncompressed .npy member of a .npz file as a view of its mapping"""
+    _ = f.seek(info.header_offset)
+    header = ZIP_LOCAL_HEADER.unpack(f.read(ZIP_LOCAL_HEADER.size))
+    name_length, extra_length = header[-2:]
+    _ = f.seek(info.header_offset + ZIP_LOCAL_HEADER.size + name_length + extra_length)
+    if np.lib.format.read_magic(f) == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    offset = f.tell()
+
+    count = int(np.prod(shape))
+    array = mapping[offset : offset + count * dtype.itemsize].view(dtype)
+    return array.reshape(shape, order="F" if fortran_order else "C")
+
+
+class ColumnarSpectra:
+    """
+    Spectra loaded from a .npz file written by `write_columnar`.
+
+    Args:
+        path: Path to the .npz file
+        mmap: If True, the arrays of an uncompressed file are memory mapped
+            instead of read. Compressed files are always read.
+    """
+
+    def __init__(self, path: Path, mmap: bool = True):
+        self.columns: dict[str, np.ndarray] = {}
+        # all members of an uncompressed file are views of one mapping
+        mapping = np.memmap(path, dtype=np.uint8, mode="r") if mmap else None
+        with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+            for info in archive.infolist():
+                name = info.filename.removesuffix(".npy")
+                if mapping is not None and info.compress_type == zipfile.ZIP_STORED:
+                    self.columns[name] = map_npz_member(mapping, f, info)
+                else:
+                    with archive.open(info) as member:
+                        self.columns[name] = np.lib.format.read_array(member)
+
+        self.values: np.ndarray = self.columns.pop("values")
+        self.offsets: np.ndarray = self.columns.pop("offsets")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> np.ndarray:
+        """The counts of spectrum i"""
+        return self.values[self.offsets[i] : self.offsets[i + 1]]
+
+    def energies(self, i: int) -> NDArray[np.float64]:
+        """The energy axis of spectrum i"""
+        return self.columns["start"][i] + self.columns["step"][i] * np.arange(len(self[i]))
@@ -0,0 +1,192 @@
+import functools
+import multiprocessing
+import time
+import traceback
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from enum import Enum
+from pathlib import Path
+
+from xps_convert.columnar import igor_spectra, write_columnar, xy_spectra
+from xps_convert.igor_to_kolxpd import (
+    IGOR_SAMPLE_PATTERN,
+    IGOR_SUFFIXES,
+    convert_igor,
+    group_igor_files,
+)
+from xps_convert.profiling import Profile, TimedWriter, file_profile
+from xps_convert.specs_xy_to_kolxpd import write_specs_prodigy_xy
+
+
+class OutputFormat(str, Enum):
+    """Format of the converted files"""
+
+    exp = "exp"  # KolXPD
+    npz = "npz"  # columnar, see xps_convert.columnar
+
+
+@dataclass(frozen=True)
+class Conversion:
+    """Input file(s) that are converted into one KolXPD file.
+
+    Args:
+        name: Name of the input file, or of the sample for Igor files.
+        files: The input files.
+        out_file: The KolXPD file to write.
+    """
+
+    name: str
+    files: list[Path]
+    out_file: Path
+
+    @property
+    def is_igor(self) -> bool:
+        return self.files[0].suffix.lower() in IGOR_SUFFIXES
+
+    @property
+    def description(self) -> str:
+        return f"sample {self.name}" if self.is_igor else f"file {self.name}"
+
+
+def plan_conversions(
+    files: Iterable[Path],
+    group_pattern: str = IGOR_SAMPLE_PATTERN,
+    output_format: OutputFormat = OutputFormat.exp,
+) -> list[Conversion]:
+    """
+    Get the conversions for the given files. Each .xy file is converted next
+    to the original, .pxt and .ibw files are grouped into samples by
+    `group_pattern` and each sample is converted into `<sample>.exp` in the
+    folder of its files. The suffix of the output files is set by
+    `output_format`.
+    """
+    suffix = f".{output_format.value}"
+    conversions: list[Conversion] = []
+    igor_files: list[Path] = []
+    for file in files:
+        if not file.is_file():
+            continue
+
+        if file.name.endswith(".xy"):
+            conversions.append(Conversion(file.name, [file], file.parent / f"{file.stem}{suffix}"))
+        elif file.suffix.lower() in IGOR_SUFFIXES:
+            igor_files.append(file)
+
+    for (folder, sample), sample_files in group_igor_files(igor_files, group_pattern).items():
+        conversions.append(Conversion(sample, sample_files, folder / f"{sample}{suffix}"))
+
+    return conversions
+
+
+def conversion_options(conversion: Conversion, group_pattern: str) -> dict[str, str]:
+    """Options that affect the output of a conversion, stored in the manifest"""
+    return {"group_pattern": group_pattern} if conversion.is_igor else {}
+
+
+@dataclass(frozen=True)
+class ConversionResult:
+    """The outcome of a conversion.
+
+    Args:
+        error: The formatted traceback if the conversion failed, else None.
+        seconds: Wall time of the conversion.
+        profile: The per-stage statistics of the conversion, if requested.
+    """
+
+    error: str | None
+    seconds: float
+    profile: Profile | None = None
+
+
+def write_conversion(conversion: Conversion, part_file: Path, profile: Profile | None = None) -> None:
+    """
+    Convert the files of a conversion into part_file, the caller removes it
+    if the conversion fails. The time spent in each stage is recorded in
+    `profile`, if passed.
+    """
+    output = file_profile(profile, part_file)
+    if conversion.out_file.suffix == ".npz":
+        spectra = (
+            igor_spectra(conversion.name, conversion.files, profile)
+            if conversion.is_igor
+            else xy_spectra(conversion.files[0], file_profile(profile, conversion.files[0]))
+        )
+        with output.stage("open"):
+            outfile = open(part_file, "wb")
+        with outfile, output.stage("write"):
+            # the spectra are read while they are written, reading is
+            # recorded in the stages of the input files
+            write_columnar(outfile, spectra)
+    elif conversion.is_igor:
+        convert_igor(conversion.name, conversion.files, part_file, profile=profile)
+    else:
+        with output.stage("open"):
+            outfile = open(part_file, "w")
+        with outfile:
+            timed = outfile if profile is None else TimedWriter(outfile, output)
+            write_specs_prodigy_xy(
+                conversion.files[0],
+                timed,  # pyright: ignore[reportArgumentType]
+                profile=file_profile(profile, conversion.files[0]),
+            )
+            timed.flush()
+
+
+def run_conversion(conversion: Conversion, profile: bool = False) -> ConversionResult:
+    """
+    Run a single conversion.
+
+    The output is streamed into a temporary file next to the output file,
+    which replaces the output file once the conversion succeeded. If
+    `profile` is True, the time spent in each stage is recorded.
+
+    Failures are returned as the formatted traceback, so that they can be
+    reported from worker processes.
+    """
+    stats = Profile() if profile else None
+    error = None
+    start = time.perf_counter()
+    part_file = conversion.out_file.with_name(f"{conversion.out_file.name}.part")
+    try:
+        write_conversion(conversion, part_file, stats)
+        _ = part_file.replace(conversion.out_file)
+
+    except Exception:
+        part_file.unlink(missing_ok=True)
+        error = traceback.format_exc()
+
+    if stats is None:
+        return ConversionResult(error, time.perf_counter() - start)
+
+    if str(part_file) in stats.files:
+        stats.files[str(conversion.out_file)] = stats.files.pop(str(part_file))
+    return ConversionResult(error, time.perf_counter() - start, stats)
+
+
+def process_pool(
+    max_workers: int, initializer: Callable[[], None] | None = None
+) -> ProcessPoolExecutor:
+    """
+    A pool of worker processes that are not forked from the current process.
+    Forking is unsafe once the process runs threads, e.g. the default thread
+    pool of `xps_convert.aio`.
+    """
+    method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+    return ProcessPoolExecutor(max_workers, multiprocessing.get_context(method), initializer)
+
+
+def run_conversions(
+    conversions: list[Conversion], jobs: int, profile: bool = False
+) -> Iterator[ConversionResult]:
+    """
+    Run conversions with up to `jobs` worker processes. The results of
+    `run_conversion` are yielded in the order of `conversions` as they finish.
+    """
+    run = functools.partial(run_conversion, profile=profile)
+    if jobs == 1 or len(conversions) < 2:
+        yield from map(run, conversions)
+        return
+
+    with process_pool(min(jobs, len(conversions))) as executor:
+        yield from executor.map(run, conversions)
@@ -0,0 +1,43 @@
+from typing import TextIO
+
+import numpy as np
+from numpy.typing import NDArray
+
+# Number of values formatted at once, bounds the size of intermediate strings
+CHUNK_SIZE = 65536
+
+
+def format_values(values: NDArray[np.generic], precision: int | None = None) -> str:
+    """
+    Format values as text with one value per line, each line terminated by a
+    newline.
+
+    Parameters
+    ----------
+    values : ndarray
+        The values to format. They are converted to float64 first.
+    precision : int or None
+        Number of decimals of the fixed-point notation. If None, the shortest
+        representation that reads back to the identical float64 is used.
+
+    Returns
+    -------
+    str
+        The formatted values.
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    # repr of a float is its shortest round-trip representation
+    template = "%r\n" if precision is None else f"%.{precision}f\n"
+    # a single %-operation formats the whole array without a Python-level loop
+    return (template * len(values)) % tuple(values.tolist())
+
+
+def write_values(f: TextIO, values: NDArray[np.generic], precision: int | None = None) -> None:
+    """
+    Write values to a text file with one value per line, see `format_values`.
+    The values are formatted in chunks, so the intermediate strings stay small
+    for long arrays.
+    """
+    values = np.asarray(values).ravel()
+    for start in range(0, len(values), CHUNK_SIZE):
+        _ = f.write(format_values(values[start : start + CHUNK_SIZE], precision))
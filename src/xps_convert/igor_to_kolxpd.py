@@ -1,64 +1,234 @@
+import io
+import re
+from collections.abc import Iterable, Iterator
 from pathlib import Path
+from typing import TextIO
 
 import numpy as np
 from numpy._typing import NDArray
 
-from igor.ibw import WaveHeaderV5
+from igor.ibw import BinaryWave, WaveHeaderV5, read_ibw
 from igor.packed import PackedFile
+from xps_convert.formatting import write_values
+from xps_convert.profiling import FileProfile, NullFileProfile, Profile, TimedWriter, file_profile
+from xps_convert.ses import SESMetadata, kolxpd_notes, parse_ses_note
 
-def convert_igor(sample_name: str, sample_files: list[Path]):
+# Scienta SES numbers exported files by appending a 4-digit sequence number
+# to the base name, e.g. "Sample1-10002.pxt" belongs to the sample "Sample1-1"
+IGOR_SAMPLE_PATTERN = r"(?P<sample>.+?)\d{4}"
+
+IGOR_SUFFIXES = (".pxt", ".ibw")
+
+# Number of values summed up at once when averaging 2D waves
+AVERAGE_CHUNK_SIZE = 1 << 20
+
+
+def igor_sample_name(file: Path, pattern: str = IGOR_SAMPLE_PATTERN) -> str:
+    """
+    Get the sample name of an Igor file. The pattern is matched against the
+    whole file name without suffix, the sample name is the group `sample`, or
+    the first group if the pattern has no group of that name. Trailing
+    separators are removed from the sample name. Files that don't match are
+    their own sample.
+    """
+    match = re.fullmatch(pattern, file.stem)
+    if match is None:
+        return file.stem
+
+    name = match.group("sample") if "sample" in match.re.groupindex else match.group(1)
+    return name.rstrip("-_ ") or file.stem
+
+
+def group_igor_files(
+    files: Iterable[Path], pattern: str = IGOR_SAMPLE_PATTERN
+) -> dict[tuple[Path, str], list[Path]]:
+    """
+    Group Igor files by folder and sample name (see `igor_sample_name`). The
+    files of each group are sorted by name.
+    """
+    groups: dict[tuple[Path, str], list[Path]] = {}
+    for file in files:
+        groups.setdefault((file.parent, igor_sample_name(file, pattern)), []).append(file)
+
+    for group in groups.values():
+        group.sort()
+    return groups
+
+
+def convert_igor(
+    sample_name: str,
+    sample_files: list[Path],
+    out_file: Path | None = None,
+    precision: int | None = None,
+    profile: Profile | None = None,
+):
+    """
+    Convert the waves of all sample_files (.pxt or .ibw) into one KolXPD
+    file. The output is written region by region. Packed files are memory
+    mapped, so the wave data is read from the mapping as it is written.
+    By default the output is written to `<sample_name>.exp` in the current
+    working directory. The counts are written with `precision` decimals, or
+    in their shortest round-trip representation if `precision` is None.
+    The time spent in each stage is recorded per file in `profile`, if
+    passed.
+    """
     print(f"Converting {sample_name}")
+    if out_file is None:
+        out_file = Path(f"{sample_name}.exp")
+
+    # the item count has to be known before the first region is written, so
+    # the record headers of all files are read first. Each file is mapped
+    # again while its waves are written, so only one file is open at a time.
     total_item_count = 0
-    all_regions = ""
     for file in sample_files:
-        print(f"Processing file: {file.name}")
-        ptx = PackedFile(str(file))
-
-        for wave in ptx.records:
-            assert isinstance(wave.wave_header, WaveHeaderV5)
-            assert wave.wave_header.n_dim[2] == 0
-            assert wave.wave_header.n_dim[3] == 0
-
-            is_2d = wave.wave_header.n_dim[1] != 0
-            name = wave.wave_header.bname
-
-            rows = wave.wave_header.n_dim[0]
-            # print(f"{rows=}")
-            columns = wave.wave_header.n_dim[1]  # 0 for 1 dim spectra (not cycled or tr)
-            # print(f"{columns=}")
-
-            num_data_points = wave.wave_header.npnts
-            start = wave.wave_header.sf_b[0]
-            step = wave.wave_header.sf_a[0]
-            end = start + (step * (num_data_points - 1))
-            notes = wave.note
-            data = np.array(wave.data)
-            if is_2d:
-                data = data.reshape(columns, rows)
-                avg = np.average(data, axis=0)
-                # print(f"{avg.shape=}")
-                # print(f"{avg=}")
-                inner_2d = ""
-                inner_item_count = 0
-                for i, spectrum in enumerate(data):
-                    inner_2d += create_region(f"{sample_name}__{name} - {i+1}", notes, start, end, step, 0, 1, spectrum)
-                    inner_item_count += 1
-
-                avg_str = create_region(f"{sample_name}__{name} (avg)", notes, start, end, step, inner_item_count, inner_item_count, avg, inner_regions=inner_2d)
-
-                all_regions += avg_str
-                total_item_count += 1
-            else:
-                all_regions += create_region(f"{sample_name}__{name}", notes, start, end, step, 0, 0, data)
-                total_item_count += 1
-
-    all = wrap_in_top_level_folder(f"{sample_name}_generated", total_item_count, all_regions)
-    with open(f"{sample_name}.exp", "w") as f:
-        _ = f.write(all)
+        ptx = open_packed_file(file, file_profile(profile, file))
+        if ptx is None:
+            total_item_count += 1
+            continue
+        with ptx:
+            total_item_count += len(ptx.index)
 
+    output = file_profile(profile, out_file)
+    with output.stage("open"):
+        f = open(out_file, "w")
+    with f:
+        # the writes are timed separately from the rendering
+        timed = f if profile is None else TimedWriter(f, output)
+        write_folder_header(timed, f"{sample_name}_generated", total_item_count)  # pyright: ignore[reportArgumentType]
+        for file in sample_files:
+            print(f"Processing file: {file.name}")
+            write_file(timed, sample_name, file, precision, file_profile(profile, file))  # pyright: ignore[reportArgumentType]
 
-def wrap_in_top_level_folder(title: str, item_count: int, folder_content: str) -> str:
-    top_level = f"""[Folder]
+        _ = timed.write("[EndFolder]")
+        timed.flush()
+
+
+def open_packed_file(file: Path, profile: FileProfile) -> PackedFile | None:
+    """Map a .pxt file and index its records, None for .ibw files"""
+    if file.suffix.lower() == ".ibw":
+        return None
+    with profile.stage("header parse") as stats:
+        ptx = PackedFile(str(file), memory_map=True, lazy=True)
+        stats.bytes_read += ptx.bytes_parsed
+    return ptx
+
+
+def write_file(
+    f: TextIO,
+    sample_name: str,
+    file: Path,
+    precision: int | None = None,
+    profile: FileProfile | None = None,
+) -> None:
+    """
+    Write the waves of a .pxt or .ibw file. A packed file is closed once its
+    waves are written, its mapping is released when the last wave is
+    deleted on return.
+    """
+    if profile is None:
+        profile = NullFileProfile()
+    ptx = open_packed_file(file, profile)
+    try:
+        for wave in iter_waves(file, ptx, profile):
+            write_wave(f, sample_name, wave, precision, profile)
+    finally:
+        if ptx is not None:
+            ptx.close()
+
+
+def iter_waves(
+    file: Path, ptx: PackedFile | None, profile: FileProfile | None = None
+) -> Iterator[BinaryWave]:
+    if profile is None:
+        profile = NullFileProfile()
+
+    if ptx is None:
+        with profile.stage("data decode") as stats:
+            wave = read_ibw(str(file))
+            stats.bytes_read += file.stat().st_size
+            stats.points += wave.wave_header.npnts
+        yield wave
+        return
+
+    for entry in ptx.index:
+        with profile.stage("data decode") as stats:
+            wave = ptx.read_wave(entry)
+            stats.bytes_read += entry.size
+            stats.points += entry.npnts
+        yield wave
+
+
+def write_wave(
+    f: TextIO,
+    sample_name: str,
+    wave: BinaryWave,
+    precision: int | None = None,
+    profile: FileProfile | None = None,
+) -> None:
+    assert isinstance(wave.wave_header, WaveHeaderV5)
+    assert wave.wave_header.n_dim[2] == 0
+    assert wave.wave_header.n_dim[3] == 0
+    if profile is None:
+        profile = NullFileProfile()
+
+    is_2d = wave.wave_header.n_dim[1] != 0
+    name = wave.wave_header.bname
+
+    rows = wave.wave_header.n_dim[0]
+    # print(f"{rows=}")
+    columns = wave.wave_header.n_dim[1]  # 0 for 1 dim spectra (not cycled or tr)
+    # print(f"{columns=}")
+
+    num_data_points = wave.wave_header.npnts
+    start = wave.wave_header.sf_b[0]
+    step = wave.wave_header.sf_a[0]
+    end = start + (step * (num_data_points - 1))
+    # the note is parsed and escaped once for all regions of the wave
+    metadata = parse_ses_note(wave.note)
+    notes = kolxpd_notes(wave.note)
+    sweeps = metadata.sweeps
+    # in the stored dtype, rows are converted to float64 when they are written
+    data = wave.data
+    if is_2d:
+        data = data.reshape(columns, rows)
+        with profile.stage("averaging") as stats:
+            avg = average_rows(data)
+            stats.points += data.size
+        # print(f"{avg.shape=}")
+        # print(f"{avg=}")
+        with profile.stage("render") as stats:
+            write_region_header(f, f"{sample_name}__{name} (avg)", notes, start, end, step, columns, columns * (sweeps or 1), metadata)
+            write_data(f, avg, start, end, step, precision)
+            for i, spectrum in enumerate(data):
+                write_region(f, f"{sample_name}__{name} - {i+1}", notes, start, end, step, 0, sweeps or 1, spectrum, precision, metadata)
+            _ = f.write("[EndRegion]\n")
+            stats.points += avg.size + data.size
+            stats.regions += columns + 1
+    else:
+        with profile.stage("render") as stats:
+            write_region(f, f"{sample_name}__{name}", notes, start, end, step, 0, sweeps or 0, data, precision, metadata)
+            stats.points += data.size
+            stats.regions += 1
+
+
+def average_rows(
+    data: NDArray[np.generic], chunk_size: int = AVERAGE_CHUNK_SIZE
+) -> NDArray[np.float64]:
+    """
+    Average the rows of a 2D wave. The rows are summed up in chunks of about
+    chunk_size values, so only one row of float64 is allocated besides the
+    chunk being converted.
+    """
+    num_rows, row_length = data.shape
+    rows_per_chunk = max(1, chunk_size // max(1, row_length))
+    total = np.zeros(row_length, dtype=np.float64)
+    for i in range(0, num_rows, rows_per_chunk):
+        total += data[i : i + rows_per_chunk].sum(axis=0, dtype=np.float64)
+    return total / num_rows
+
+
+def write_folder_header(f: TextIO, title: str, item_count: int) -> None:
+    _ = f.write(f"""[Folder]
 KolXPDversion=1.8.0.69
 Title={title}
 NotesHTML=0
@@ -67,13 +237,11 @@ timeStart=0
 timeEnd=0
 Color=0
 ItemCount={item_count}
-"""
-    top_level += folder_content
-    top_level += "[EndFolder]"
-    return top_level
+""")
 
 
-def create_region(
+def write_region_header(
+    f: TextIO,
     region_title: str,
     notes: str,
     start: float,
@@ -81,23 +249,30 @@ def create_region(
     step: float,
     item_count: int,
     sweeps: int,
-    data: NDArray[np.float64],
-    inner_regions: str | None = None,
-) -> str:
-    region = f"""[Region]
+    metadata: SESMetadata | None = None,
+) -> None:
+    """
+    Write the header of a region. `notes` are written as given, escaped with
+    `kolxpd_notes`. The acquisition parameters are taken from `metadata` if
+    given, otherwise defaults are written.
+    """
+    if metadata is None:
+        metadata = SESMetadata()
+    dwell = format_number(metadata.step_time, 100)
+    _ = f.write(f"""[Region]
 KolXPDversion=1.8.0.69
 Title={region_title}
-Notes={notes.replace("\n", "#0D#0A")}
+Notes={notes}
 timeStart=0
 timeEnd=0
 Color=0
 ItemCount={item_count}
 Start={start}
 End={end}
-Dwell=100
-DwellSmart=100
-PassEn=0
-ExcitEn=0
+Dwell={dwell}
+DwellSmart={dwell}
+PassEn={format_number(metadata.pass_energy, 0)}
+ExcitEn={format_number(metadata.excitation_energy, 0)}
 Step={step}
 Sweeps={sweeps}
 NumOfPointSets=5
@@ -106,28 +281,86 @@ Smart=0
 WF=0
 AxisConvUsesWF=0
 Udet=1000
-LensMode=
+LensMode={metadata.lens_mode}
 UseMonochromator=0
 Level=
 Cross=1
 Asym=0
 ChargeShift=0
 AreaMult=1
-"""
-    region += create_data(data, start, end, step)
-    if inner_regions is not None:
-        region += inner_regions
+""")
+
 
-    region += "[EndRegion]\n"
-    return region
+def write_region(
+    f: TextIO,
+    region_title: str,
+    notes: str,
+    start: float,
+    end: float,
+    step: float,
+    item_count: int,
+    sweeps: int,
+    data: NDArray[np.float64],
+    precision: int | None = None,
+    metadata: SESMetadata | None = None,
+) -> None:
+    write_region_header(f, region_title, notes, start, end, step, item_count, sweeps, metadata)
+    write_data(f, data, start, end, step, precision)
+    _ = f.write("[EndRegion]\n")
 
 
-def create_data(data: NDArray[np.float64], start: float, end: float, step: float):
-    d = f"""[Data]
+def format_number(value: float | None, default: float) -> str:
+    """Format a header value, integral values without decimals"""
+    if value is None:
+        value = default
+    return str(int(value)) if float(value).is_integer() else repr(value)
+
+
+def write_data(
+    f: TextIO,
+    data: NDArray[np.float64],
+    start: float,
+    end: float,
+    step: float,
+    precision: int | None = None,
+) -> None:
+    _ = f.write(f"""[Data]
 #Range {end} {start}
 #X Eq {start} {step}
-"""
-    d += "\n".join(str(i) for i in data)
-    d += "\n"
-    return d
+""")
+    write_values(f, data, precision)
+
+
+def wrap_in_top_level_folder(title: str, item_count: int, folder_content: str) -> str:
+    top_level = io.StringIO()
+    write_folder_header(top_level, title, item_count)
+    _ = top_level.write(folder_content)
+    _ = top_level.write("[EndFolder]")
+    return top_level.getvalue()
 
+
+def create_region(
+    region_title: str,
+    notes: str,
+    start: float,
+    end: float,
+    step: float,
+    item_count: int,
+    sweeps: int,
+    data: NDArray[np.float64],
+    inner_regions: str | None = None,
+) -> str:
+    region = io.StringIO()
+    write_region_header(region, region_title, kolxpd_notes(notes), start, end, step, item_count, sweeps)
+    write_data(region, data, start, end, step)
+    if inner_regions is not None:
+        _ = region.write(inner_regions)
+
+    _ = region.write("[EndRegion]\n")
+    return region.getvalue()
+
+
+def create_data(data: NDArray[np.float64], start: float, end: float, step: float):
+    d = io.StringIO()
+    write_data(d, data, start, end, step)
+    return d.getvalue()
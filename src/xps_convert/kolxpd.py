@@ -0,0 +1,241 @@
+import io
+import mmap
+import re
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Self
+
+import numpy as np
+from numpy.typing import NDArray
+
+from igor.packed import map_file
+from xps_convert.igor_to_kolxpd import write_folder_header
+
+# The lines starting a section of a KolXPD file, e.g. "[Region]"
+SECTION_PATTERN = re.compile(rb"^\[(Folder|EndFolder|Region|EndRegion|Data)\]\r?$", re.MULTILINE)
+
+# Number of bytes copied at once when merging files
+COPY_CHUNK_SIZE = 1 << 20
+
+
+@dataclass
+class ExpRegion:
+    """
+    Index entry of a region of a KolXPD file. The data is not parsed, only
+    the byte ranges are recorded, see `ExpFile.data`.
+
+    Args:
+        header: The `key=value` lines of the region header.
+        offset: Byte-position of the `[Region]` line.
+        end: Byte-position after the `[EndRegion]` line.
+        data_offset: Byte-position of the first value of the `[Data]` block.
+        data_end: Byte-position after the last value of the `[Data]` block.
+        start: Energy of the first point, from the `#X Eq` line.
+        step: Energy step between points, from the `#X Eq` line.
+        children: Regions inside this region, e.g. the cycles of an average.
+    """
+
+    header: dict[str, str]
+    offset: int
+    end: int = -1
+    data_offset: int = -1
+    data_end: int = -1
+    start: float = 0.0
+    step: float = 0.0
+    children: list["ExpRegion"] = field(default_factory=list)
+
+    @property
+    def title(self) -> str:
+        return self.header.get("Title", "")
+
+
+@dataclass
+class ExpFolder:
+    """
+    Index entry of a folder of a KolXPD file.
+
+    Args:
+        header: The `key=value` lines of the folder header.
+        offset: Byte-position of the `[Folder]` line.
+        end: Byte-position after the `[EndFolder]` line.
+        children: The folders and regions in this folder.
+    """
+
+    header: dict[str, str]
+    offset: int
+    end: int = -1
+    children: list["ExpFolder | ExpRegion"] = field(default_factory=list)
+
+    @property
+    def title(self) -> str:
+        return self.header.get("Title", "")
+
+
+def parse_header(raw: bytes, encoding: str) -> dict[str, str]:
+    header: dict[str, str] = {}
+    for line in raw.decode(encoding, errors="replace").splitlines():
+        key, sep, value = line.partition("=")
+        if sep:
+            header[key] = value
+    return header
+
+
+def line_end(buffer: bytes | mmap.mmap, position: int) -> int:
+    """Byte-position after the line containing position"""
+    end = buffer.find(b"\n", position)
+    return len(buffer) if end == -1 else end + 1
+
+
+class ExpFile:
+    """
+    A KolXPD file (.exp) as written by the converters.
+
+    The file is memory mapped and indexed in one scan for the section lines
+    (`[Folder]`, `[Region]`, `[Data]`, ...). Only the headers are decoded,
+    the values of a region are parsed when they are requested with `data`.
+
+    Args:
+        path: Path to the KolXPD file
+        encoding: Encoding of the header values
+    """
+
+    def __init__(self, path: Path, encoding: str = "utf-8"):
+        self.path = path
+        self.items: list[ExpFolder | ExpRegion] = []
+        self._mapping = map_file(str(path))
+        self._index(encoding)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Release the memory map of the file"""
+        self._mapping.close()
+
+    def _index(self, encoding: str) -> None:
+        mapping = self._mapping
+        stack: list[ExpFolder | ExpRegion] = []
+        matches = list(SECTION_PATTERN.finditer(mapping))
+        for k, match in enumerate(matches):
+            section = match.group(1)
+            body = line_end(mapping, match.end())
+            next_section = matches[k + 1].start() if k + 1 < len(matches) else len(mapping)
+
+            if section in (b"Folder", b"Region"):
+                header = parse_header(mapping[body:next_section], encoding)
+                item = ExpFolder(header, match.start()) if section == b"Folder" else ExpRegion(header, match.start())
+                if stack:
+                    stack[-1].children.append(item)  # pyright: ignore[reportArgumentType]
+                else:
+                    self.items.append(item)
+                stack.append(item)
+
+            elif section == b"Data":
+                region = stack[-1] if stack else None
+                if not isinstance(region, ExpRegion):
+                    raise ValueError(f"[Data] outside of a region at byte {match.start()} of {self.path}")
+                # "#Range ..." and "#X Eq <start> <step>" precede the values
+                position = body
+                while mapping[position : position + 1] == b"#" and position < next_section:
+                    line = mapping[position : line_end(mapping, position)]
+                    if line.startswith(b"#X Eq"):
+                        region.start, region.step = map(float, line.split()[2:4])
+                    position = line_end(mapping, position)
+                region.data_offset = position
+                region.data_end = next_section
+
+            else:
+                expected = ExpFolder if section == b"EndFolder" else ExpRegion
+                if not stack or not isinstance(stack[-1], expected):
+                    raise ValueError(
+                        f"Unexpected [{section.decode()}] at byte {match.start()} of {self.path}"
+                    )
+                stack.pop().end = body
+
+        if stack:
+            raise ValueError(f"{self.path} ends inside of [{type(stack[-1]).__name__}] {stack[-1].title!r}")
+
+    @property
+    def regions(self) -> list[ExpRegion]:
+        """All regions of the file in file order, including inner regions"""
+        return list(iter_regions(self.items))
+
+    def region(self, title: str) -> ExpRegion:
+        """Get the first region with the given title"""
+        for region in iter_regions(self.items):
+            if region.title == title:
+                return region
+        raise KeyError(f"No region titled {title!r} in {self.path}")
+
+    def raw(self, item: ExpFolder | ExpRegion) -> bytes:
+        """The bytes of a folder or region, including all of its children"""
+        return self._mapping[item.offset : item.end]
+
+    def data(self, region: ExpRegion) -> NDArray[np.float64]:
+        """Parse the values of the `[Data]` block of a region"""
+        if region.data_offset < 0:
+            return np.zeros(0)
+        return np.array(self._mapping[region.data_offset : region.data_end].split(), dtype=np.float64)
+
+    def energies(self, region: ExpRegion) -> NDArray[np.float64]:
+        """The energy axis of a region"""
+        return region.start + region.step * np.arange(len(self.data(region)))
+
+
+def iter_regions(items: list[ExpFolder | ExpRegion]) -> Iterator[ExpRegion]:
+    for item in items:
+        if isinstance(item, ExpRegion):
+            yield item
+        yield from iter_regions(item.children)
+
+
+def merge_items(exp: ExpFile, flatten: bool) -> list[ExpFolder | ExpRegion]:
+    """
+    The items of a file to merge, the content of its top-level folder if
+    `flatten` is True and the file has a single top-level folder.
+    """
+    if flatten and len(exp.items) == 1 and isinstance(exp.items[0], ExpFolder):
+        return exp.items[0].children
+    return exp.items
+
+
+def merge_exp(files: Iterable[Path], out_file: BinaryIO, title: str, flatten: bool = False) -> int:
+    """
+    Merge KolXPD files into a new top-level folder named `title`. The items
+    of the files are copied as raw byte ranges, their values are not parsed.
+    With `flatten`, the top-level folder of each file is replaced by its
+    content.
+
+    Returns:
+        The number of items in the new top-level folder.
+    """
+    ranges: list[tuple[Path, list[tuple[int, int]]]] = []
+    for file in files:
+        with ExpFile(file) as exp:
+            ranges.append((file, [(item.offset, item.end) for item in merge_items(exp, flatten)]))
+    item_count = sum(len(items) for _, items in ranges)
+
+    header = io.StringIO()
+    write_folder_header(header, title, item_count)
+    _ = out_file.write(header.getvalue().encode())
+    for file, items in ranges:
+        with open(file, "rb") as f:
+            for offset, end in items:
+                _ = f.seek(offset)
+                remaining = end - offset
+                while remaining > 0:
+                    chunk = f.read(min(remaining, COPY_CHUNK_SIZE))
+                    if not chunk:
+                        raise ValueError(f"{file} was truncated while merging")
+                    _ = out_file.write(chunk)
+                    remaining -= len(chunk)
+                # the converters end the top-level folder without a line break
+                _ = f.seek(end - 1)
+                if f.read(1) != b"\n":
+                    _ = out_file.write(b"\n")
+    _ = out_file.write(b"[EndFolder]")
+    return item_count
@@ -1,31 +1,214 @@
+import signal
+import time
 import traceback
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Any
 
+import click
 import typer
+from typer.core import TyperGroup
 
-from xps_convert.specs_xy_to_kolxpd import convert_specs_prodigy_xy
+from xps_convert.cache import ConversionCache, hash_inputs
+from xps_convert.conversion import (
+    Conversion,
+    OutputFormat,
+    conversion_options,
+    plan_conversions,
+    process_pool,
+    run_conversions,
+)
+from xps_convert.igor_to_kolxpd import IGOR_SAMPLE_PATTERN
+from xps_convert.kolxpd import merge_exp
+from xps_convert.profiling import save_report
+from xps_convert.watch import Watcher
 
 
-app = typer.Typer()
+class DefaultCommandGroup(TyperGroup):
+    """Runs the `convert` command if the first argument is not a command"""
 
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        if args and args[0] not in self.commands and args[0] not in ctx.help_option_names:
+            args = ["convert", *args]
+        return super().parse_args(ctx, args)
 
-@app.command()
+
+app = typer.Typer(cls=DefaultCommandGroup)
+
+
+def ignore_interrupts() -> None:
+    """Let only the main process handle Ctrl+C, it waits for the running conversions"""
+    _ = signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+@app.command("convert")
 def main(
     files: Annotated[list[Path], typer.Argument(help="File(s) to convert")],
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", min=1, help="Number of files to convert in parallel"),
+    ] = 1,
+    force: Annotated[
+        bool,
+        typer.Option(
+            "--force",
+            "-f",
+            help="Convert all files, even if they are unchanged since their last conversion",
+        ),
+    ] = False,
+    group_pattern: Annotated[
+        str,
+        typer.Option(
+            help="Regular expression matched against the names of .pxt/.ibw "
+            "files (without suffix). Its group 'sample' (or its first group) is "
+            "the sample name, all files of a sample are converted into one file."
+        ),
+    ] = IGOR_SAMPLE_PATTERN,
+    output_format: Annotated[
+        OutputFormat,
+        typer.Option(
+            "--format",
+            help="Format of the converted files: KolXPD (exp) or columnar, "
+            "memory-mappable numpy arrays (npz)",
+        ),
+    ] = OutputFormat.exp,
+    profile: Annotated[
+        Path | None,
+        typer.Option(
+            help="Write the wall time, bytes read, points decoded, regions "
+            "written and peak memory of each stage of each conversion to this "
+            "JSON file"
+        ),
+    ] = None,
+) -> None:
+    """Convert SpecsLab Prodigy .xy and Scienta SES .pxt/.ibw files to KolXPD files"""
+    caches: dict[Path, ConversionCache] = {}
+    conversions: list[Conversion] = []
+    inputs: list[dict[str, str]] = []
+    for conversion in plan_conversions(files, group_pattern, output_format):
+        folder = conversion.out_file.parent
+        if folder not in caches:
+            caches[folder] = ConversionCache(folder)
+
+        try:
+            input_hashes = hash_inputs(conversion.files)
+        except OSError:
+            # e.g. removed or unreadable since the conversions were planned
+            print(f"Failed to convert {conversion.description}:")
+            print(traceback.format_exc())
+            continue
+        if not force and caches[folder].is_fresh(
+            conversion.out_file, input_hashes, conversion_options(conversion, group_pattern)
+        ):
+            print(f"Skipping unchanged {conversion.description}")
+            continue
+
+        conversions.append(conversion)
+        inputs.append(input_hashes)
+
+    report: list[dict[str, Any]] = []
+    try:
+        for conversion, input_hashes, result in zip(
+            conversions, inputs, run_conversions(conversions, jobs, profile is not None)
+        ):
+            if result.profile is not None:
+                report.append(
+                    {
+                        "name": conversion.name,
+                        "output": str(conversion.out_file),
+                        "seconds": result.seconds,
+                        "error": result.error,
+                        "files": result.profile.to_dict(),
+                    }
+                )
+            if result.error is not None:
+                print(f"Failed to convert {conversion.description}:")
+                print(result.error)
+                continue
+
+            caches[conversion.out_file.parent].record(
+                conversion.out_file, input_hashes, conversion_options(conversion, group_pattern)
+            )
+    finally:
+        for cache in caches.values():
+            cache.save()
+        if profile is not None:
+            save_report(profile, report)
+
+
+@app.command()
+def merge(
+    files: Annotated[list[Path], typer.Argument(help="KolXPD file(s) to merge")],
+    output: Annotated[Path, typer.Option("--output", "-o", help="The merged KolXPD file")],
+    title: Annotated[
+        str | None,
+        typer.Option(help="Title of the new top-level folder, the name of the output by default"),
+    ] = None,
+    flatten: Annotated[
+        bool,
+        typer.Option(help="Put the content of the top-level folder of each file into the new folder"),
+    ] = False,
+) -> None:
+    """
+    Merge converted KolXPD files into one file with a new top-level folder.
+    The regions are copied without parsing their values.
+    """
+    part_file = output.with_name(f"{output.name}.part")
+    try:
+        with open(part_file, "wb") as f:
+            item_count = merge_exp(files, f, output.stem if title is None else title, flatten)
+        _ = part_file.replace(output)
+    except BaseException:
+        part_file.unlink(missing_ok=True)
+        raise
+    print(f"Merged {len(files)} files with {item_count} items into {output}")
+
+
+@app.command()
+def watch(
+    folder: Annotated[Path, typer.Argument(help="Folder to watch", file_okay=False, exists=True)],
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", min=1, help="Number of files to convert in parallel"),
+    ] = 1,
+    interval: Annotated[
+        float, typer.Option(min=0.1, help="Seconds between two checks of the folder")
+    ] = 1.0,
+    settle: Annotated[
+        float,
+        typer.Option(min=0, help="Seconds a file must stay unchanged before it is converted"),
+    ] = 2.0,
+    group_pattern: Annotated[
+        str,
+        typer.Option(
+            help="Regular expression matched against the names of .pxt/.ibw "
+            "files (without suffix). Its group 'sample' (or its first group) is "
+            "the sample name, all files of a sample are converted into one file."
+        ),
+    ] = IGOR_SAMPLE_PATTERN,
+    output_format: Annotated[
+        OutputFormat,
+        typer.Option(
+            "--format",
+            help="Format of the converted files: KolXPD (exp) or columnar, "
+            "memory-mappable numpy arrays (npz)",
+        ),
+    ] = OutputFormat.exp,
 ) -> None:
-    for file in files:
-        out_name = file.parent / f"{file.stem}.exp"
-
-        if file.is_file() and file.name.endswith(".xy"):
-            try:
-                output = convert_specs_prodigy_xy(file)
-                with open(out_name, "w") as outfile:
-                    _ = outfile.write(output)
-
-            except Exception:
-                print(f"Failed to convert file {file.name}:")
-                print(traceback.format_exc())
+    """
+    Convert new and changed files in a folder while they are written, until
+    interrupted with Ctrl+C.
+    """
+    with process_pool(jobs, ignore_interrupts) as executor:
+        watcher = Watcher(folder, executor, settle, group_pattern, output_format)
+        print(f"Watching {folder}, press Ctrl+C to stop")
+        try:
+            while True:
+                watcher.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,139 @@
+import json
+import sys
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, TextIO
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+# The time spent in nested stages of each active stage, per thread
+_active_stages = threading.local()
+
+
+def peak_rss() -> int | None:
+    """Peak resident set size of the current process in bytes, if known"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@dataclass
+class StageStats:
+    """
+    Statistics of one stage of the conversion of a file. The stages are
+    "open", "header parse", "data decode", "averaging", "render" and "write".
+
+    Args:
+        seconds: Wall time spent in the stage.
+        bytes_read: Number of bytes read from the input file.
+        points: Number of data points decoded or processed.
+        regions: Number of KolXPD regions written.
+        peak_rss: Peak resident set size of the process in bytes at the end
+            of the stage, None if it can't be determined.
+    """
+
+    seconds: float = 0.0
+    bytes_read: int = 0
+    points: int = 0
+    regions: int = 0
+    peak_rss: int | None = None
+
+
+@dataclass
+class FileProfile:
+    """The statistics of each stage of the conversion of a file."""
+
+    stages: dict[str, StageStats] = field(default_factory=dict)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        """
+        Time the enclosed block as stage `name`. Repeated stages, e.g. the
+        decoding of each wave, are accumulated. Stages are exclusive: the time
+        of a stage entered within the block, e.g. "write" within "render", is
+        not added to this stage. The statistics are yielded, so counts can be
+        added inside the block.
+        """
+        stats = self.stages.setdefault(name, StageStats())
+        stack: list[float] = _active_stages.__dict__.setdefault("stack", [])
+        stack.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield stats
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += elapsed
+            stats.seconds += elapsed - nested
+            stats.peak_rss = peak_rss()
+
+
+class NullFileProfile(FileProfile):
+    """A file profile that records nothing, used when profiling is off."""
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageStats]:
+        yield StageStats()
+
+
+class TimedWriter:
+    """
+    A text file whose writes are timed as the "write" stage of `profile`,
+    separately from the stage they are called in.
+
+    Args:
+        f: The file to write to
+        profile: The profile of the written file
+    """
+
+    def __init__(self, f: TextIO, profile: FileProfile):
+        self.f = f
+        self.profile = profile
+
+    def write(self, s: str) -> int:
+        with self.profile.stage("write"):
+            return self.f.write(s)
+
+    def flush(self) -> None:
+        with self.profile.stage("write"):
+            self.f.flush()
+
+
+@dataclass
+class Profile:
+    """The statistics of the conversion of several files, keyed by file."""
+
+    files: dict[str, FileProfile] = field(default_factory=dict)
+
+    def file(self, path: Path | str) -> FileProfile:
+        """Get the profile of a file, it is created on first access"""
+        return self.files.setdefault(str(path), FileProfile())
+
+    def to_dict(self) -> dict[str, dict[str, dict[str, Any]]]:
+        return {
+            path: {name: asdict(stats) for name, stats in profile.stages.items()}
+            for path, profile in self.files.items()
+        }
+
+
+def file_profile(profile: Profile | None, path: Path | str) -> FileProfile:
+    """Get the profile of a file in `profile`, one that records nothing if None"""
+    return NullFileProfile() if profile is None else profile.file(path)
+
+
+def save_report(path: Path, conversions: list[dict[str, Any]]) -> None:
+    """Write a profiling report of the conversions as JSON"""
+    with open(path, "w") as f:
+        json.dump({"conversions": conversions}, f, indent=2)
+        _ = f.write("\n")
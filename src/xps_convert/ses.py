@@ -0,0 +1,81 @@
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+@dataclass(frozen=True)
+class SESMetadata:
+    """Acquisition parameters from the note of a wave written by Scienta SES.
+
+    Args:
+        region_name: Name of the region.
+        lens_mode: Lens mode of the analyzer.
+        acquisition_mode: "Swept" or "Fixed".
+        energy_scale: "Binding" or "Kinetic".
+        pass_energy: Pass energy in eV.
+        excitation_energy: Excitation energy in eV.
+        step_time: Dwell time per step in ms.
+        sweeps: Number of sweeps.
+        low_energy: Lowest energy of the region in eV.
+        high_energy: Highest energy of the region in eV.
+        energy_step: Energy step in eV.
+    """
+
+    region_name: str = ""
+    lens_mode: str = ""
+    acquisition_mode: str = ""
+    energy_scale: str = ""
+    pass_energy: float | None = None
+    excitation_energy: float | None = None
+    step_time: float | None = None
+    sweeps: int | None = None
+    low_energy: float | None = None
+    high_energy: float | None = None
+    energy_step: float | None = None
+
+
+def parse_float(value: str | None) -> float | None:
+    try:
+        return float(value)  # pyright: ignore[reportArgumentType]
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_int(value: str | None) -> int | None:
+    number = parse_float(value)
+    return None if number is None or not number.is_integer() else int(number)
+
+
+@lru_cache(maxsize=256)
+def parse_ses_note(note: str) -> SESMetadata:
+    """
+    Parse the `key=value` lines of a SES wave note. Only the first
+    occurrence of a key is used, values that can't be converted are None.
+    The results are cached, as all regions of a wave (and often several
+    waves) share the same note.
+    """
+    values: dict[str, str] = {}
+    for line in note.splitlines():
+        key, sep, value = line.partition("=")
+        key = key.strip()
+        if sep and key not in values:
+            values[key] = value.strip()
+
+    return SESMetadata(
+        region_name=values.get("Region Name", ""),
+        lens_mode=values.get("Lens Mode", ""),
+        acquisition_mode=values.get("Acquisition Mode", ""),
+        energy_scale=values.get("Energy Scale", ""),
+        pass_energy=parse_float(values.get("Pass Energy")),
+        excitation_energy=parse_float(values.get("Excitation Energy")),
+        step_time=parse_float(values.get("Step Time")),
+        sweeps=parse_int(values.get("Number of Sweeps")),
+        low_energy=parse_float(values.get("Low Energy")),
+        high_energy=parse_float(values.get("High Energy")),
+        energy_step=parse_float(values.get("Energy Step")),
+    )
+
+
+@lru_cache(maxsize=256)
+def kolxpd_notes(note: str) -> str:
+    """Escape the line breaks of a note for the Notes field of KolXPD"""
+    return note.replace("\n", "#0D#0A")
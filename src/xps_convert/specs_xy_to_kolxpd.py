@@ -1,14 +1,21 @@
 from pathlib import Path
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+from typing import TextIO
 import numpy as np
 import copy
+import io
+import itertools
+
+from xps_convert.formatting import format_values
+from xps_convert.profiling import FileProfile, NullFileProfile
 
 class Specs_XY_Data_Block:
-    def __init__(self, data_lines: list[str], header_parameters: dict):
-        data_lines = [line.strip() for line in data_lines if line.strip()
-                      and not line.startswith('#')]
-        self.data = np.array([[float(s) for s in line.split()]
-                              for line in data_lines])
+    def __init__(self, data_lines: Iterable[str], header_parameters: dict):
+        # comments and blank lines are skipped by the parser, only energy and
+        # counts are kept if the export contains further columns
+        self.data = np.loadtxt(data_lines, dtype=np.float64, comments='#',
+                               usecols=(0, 1), ndmin=2)
         self.parameters = ''
         self.sweeps = ''
         self.scan = ''
@@ -37,7 +44,8 @@ class Specs_XY_Data_Block:
                         print_cycle: bool=False,
                         print_scan: bool=False,
                         parameters_as_notes: bool=False,
-                        no_region_end=False) -> str:
+                        no_region_end=False,
+                        precision: int | None=6) -> str:
         name = self.header_parameters['Title']
         if print_cycle: 
             name += f' - cycle {self.cycle}'
@@ -80,15 +88,16 @@ AreaMult=1
 #Range {self.start:.2f} {self.end:.2f}
 #X Eq {self.start:.2f} {self.step:.2f}
 '''
-        datastr = np.char.mod('%f', self.data[:,1])
-        out += "\n".join(datastr) + '\n'
+        out += format_values(self.data[:,1], precision)
         if no_region_end:
             return out
         out += '[EndRegion]\n'
         return out
 
 def get_data_avg(data_blocks,
-                 header_parameters: dict={}) -> Specs_XY_Data_Block:
+                 header_parameters: dict={},
+                 nan_aware: bool=False,
+                 weights: Sequence[float] | None=None) -> Specs_XY_Data_Block:
     '''
     Takes a collection of Specs_XY_Data_Block objects and returns one with
     averaged data.
@@ -100,6 +109,12 @@ def get_data_avg(data_blocks,
     header : dict of {str: str}
         Header parameters for the Specs_XY_Data_Block. If nothing is passed,
         will use the parameters of data_blocks[0].
+    nan_aware : bool
+        If True, NaN counts are ignored in the average. Points that are NaN
+        in all data blocks stay NaN.
+    weights : sequence of float
+        Weight of each data block, e.g. its number of sweeps. If nothing is
+        passed, all data blocks are weighted equally.
 
     Returns
     -------
@@ -107,125 +122,361 @@ def get_data_avg(data_blocks,
         A new data block with averaged data.
 
     '''
-    if isinstance(data_blocks, Iterable):
-        if not all(isinstance(block, Specs_XY_Data_Block)
-                   for block in data_blocks):
-            raise TypeError('data_blocks: Expected Iterable of type '
-                            'Specs_XY_Data_Block, found '
-                            f'{[str(type(block)) for block in data_blocks]}')
-    else:
+    if not isinstance(data_blocks, Iterable):
         raise TypeError('data_blocks: expected Iterable.')
-    if not all([np.shape(block.data) == np.shape(data_blocks[0].data)]
+    data_blocks = list(data_blocks)
+    if not all(isinstance(block, Specs_XY_Data_Block)
                for block in data_blocks):
+        raise TypeError('data_blocks: Expected Iterable of type '
+                        'Specs_XY_Data_Block, found '
+                        f'{[str(type(block)) for block in data_blocks]}')
+    if len({np.shape(block.data) for block in data_blocks}) != 1:
         raise ValueError('Data blocks must contain the same number of '
                          'data points.')
-    if not all(np.allclose(block.data[:,0], data_blocks[0].data[:,0])
-               for block in data_blocks):
+
+    # one (blocks, points, 2) array, the reductions run over the first axis
+    stacked = np.stack([block.data for block in data_blocks])
+    energies = stacked[:, :, 0]
+    counts = stacked[:, :, 1]
+    if not np.allclose(energies, energies[0]):
         raise ValueError('Data block energy ranges are not equal.')
 
-    avg_block = copy.deepcopy(data_blocks[0])
-    if header_parameters:
-        avg_block.header_parameters = copy.copy(header_parameters)
-    avg_block.data[:, 1] = (sum([block.data[:, 1] for block in data_blocks])
-                            / len(data_blocks))
+    if nan_aware:
+        avg = np.ma.average(np.ma.masked_invalid(counts), axis=0,
+                            weights=weights).filled(np.nan)
+    else:
+        avg = np.average(counts, axis=0, weights=weights)
+
+    avg_block = copy.copy(data_blocks[0])
+    avg_block.header_parameters = copy.copy(header_parameters
+                                            or data_blocks[0].header_parameters)
+    avg_block.data = stacked[0].copy()
+    avg_block.data[:, 1] = avg
     return avg_block
 
 
-def convert_specs_prodigy_xy(source_file: Path) -> str:
+@dataclass
+class XYCycleIndex:
     '''
-    Creates a KolXPD file from an XY file exported from SpecsLabs Prodigy.
-    That file must contain exactly one loop (also works for profiling).
+    Line ranges of a cycle in an XY file.
+
+    Attributes
+    ----------
+    number : str
+        The cycle number as written in the file.
+    header : range
+        Lines of the cycle header, starting at the first '# Cycle:' line.
+    scans : list of range
+        Lines of each data block (scan or curve) of the cycle.
     '''
+    number: str
+    header: range
+    scans: list[range] = field(default_factory=list)
 
-    def process_region(data_lines: list[str], header_colwidth: int=32) -> str:
-        # if the file contains any operations, drop them right away
-        # TODO: Could be implemented to keep them with a different name, 
-        #   but I don't see the point
-        try:
-            data_lines = data_lines[
-                :next(i for i in range(len(data_lines))
-                      if data_lines[i].startswith('# Operation: '))]
-        except StopIteration:
-            pass
-        sub_idx = [i for i in range(len(data_lines))
-                   if data_lines[i].startswith('# Cycle:')]
-        # everything up until the first Cycle is general header:
-        specs_to_kolxpd_header = {
-            '# Region:': 'Title',
-            '# Analyzer Lens:': 'LensMode',       # old format (≤4.120)
-            '# Analyzer Lens Mode:': 'LensMode',  # new format (≥4.134)
-            '# Excitation Energy:': 'ExcitEn',
-            '# Pass Energy:': 'PassEn',
-            '# Detector Voltage:': 'Udet',
-            '# Eff. Workfunction:': 'WF',
-            }
-        header_parameters = {}
-        comment = ''
-        notes = ''
-        for line in data_lines[:sub_idx[0]]:
-            left_side = line[:header_colwidth].strip()
-            right_side = line[header_colwidth:].strip()
-            if left_side in specs_to_kolxpd_header:
-                header_parameters[specs_to_kolxpd_header[left_side]] = right_side
-            elif left_side == '# Scan Variable:':
-                 header_parameters['AxisBindingEn'] = '0' if 'Kinetic' in right_side else '1'
-            elif left_side == '# Dwell Time:':
-                try:
-                    dw = float(right_side)*1000  # s to ms
-                except ValueError:
-                    dw = 0
-                header_parameters['Dwell']=f'{dw:0.0f}'
-            elif line.startswith('# Comment:'):
-                comment = f'comment: {right_side}#0D#0A' if right_side else ''
-            else:
-                # collect everything unused up to this point into the notes
-                notes += f'{left_side[2:]} {right_side}#0D#0A'
-        header_parameters['Notes'] = comment + notes
-
-        last_cycle_nr = ''
-        data_per_cycle = {}
-        total_data = 0
-        for i in range(len(sub_idx)):
-            cycle_nr = data_lines[sub_idx[i]].split(',')[0].split()[-1]
-            if cycle_nr != last_cycle_nr:
-                # pure header block - process
-                parameters = []
-                for line in data_lines[sub_idx[i]:sub_idx[i+1]]:
-                    if line.startswith('# Number of Scans:'):
-                        sweeps = line.split()[-1].strip()
-                    elif line.startswith('# Parameter:'):
-                        parameters.append(line.split('# Parameter:')[-1].strip())
+
+@dataclass
+class XYRegionIndex:
+    '''
+    Line ranges of a region in an XY file.
+
+    Attributes
+    ----------
+    header : range
+        Lines of the region header, from the '# Region:' line up to the first
+        cycle.
+    cycles : list of XYCycleIndex
+        The cycles of the region. Operation results at the end of the region
+        are not indexed.
+    '''
+    header: range
+    cycles: list[XYCycleIndex] = field(default_factory=list)
+
+    @property
+    def stop(self) -> int:
+        '''The line after the last indexed line of the region.'''
+        if not self.cycles:
+            return self.header.stop
+        last_cycle = self.cycles[-1]
+        return (last_cycle.scans[-1].stop if last_cycle.scans
+                else last_cycle.header.stop)
+
+
+@dataclass
+class XYGroupIndex:
+    '''
+    Lines of a group in an XY file.
+
+    Attributes
+    ----------
+    line : int
+        The '# Group:' line.
+    name : str
+        The name of the group.
+    regions : list of XYRegionIndex
+        The regions of the group.
+    '''
+    line: int
+    name: str
+    regions: list[XYRegionIndex] = field(default_factory=list)
+
+
+@dataclass
+class XYFileIndex:
+    '''
+    Hierarchical line index (group -> region -> cycle -> scan) of an XY file.
+
+    Attributes
+    ----------
+    header : range
+        Lines of the general file header, up to the first group.
+    groups : list of XYGroupIndex
+        The groups of the file.
+    '''
+    header: range
+    groups: list[XYGroupIndex] = field(default_factory=list)
+
+
+@dataclass
+class XYRegion:
+    '''
+    A parsed region of an XY file.
+
+    Attributes
+    ----------
+    group : str
+        The name of the group the region belongs to.
+    header_parameters : dict of {str: str}
+        KolXPD header parameters from the region header.
+    data_per_cycle : dict of {str: list of Specs_XY_Data_Block}
+        The data blocks of each cycle, keyed by the cycle number.
+    '''
+    group: str
+    header_parameters: dict[str, str]
+    data_per_cycle: dict[str, list[Specs_XY_Data_Block]]
+
+
+SPECS_TO_KOLXPD_HEADER = {
+    '# Region:': 'Title',
+    '# Analyzer Lens:': 'LensMode',       # old format (≤4.120)
+    '# Analyzer Lens Mode:': 'LensMode',  # new format (≥4.134)
+    '# Excitation Energy:': 'ExcitEn',
+    '# Pass Energy:': 'PassEn',
+    '# Detector Voltage:': 'Udet',
+    '# Eff. Workfunction:': 'WF',
+    }
+
+
+def index_xy_lines(data_lines: Iterable[str]) -> XYFileIndex:
+    '''
+    Build the line index of an XY file exported from SpecsLabs Prodigy in a
+    single pass over its lines. The lines can be streamed, e.g. from an open
+    file, they are not kept.
+    '''
+    # collect the structural lines in one pass ...
+    markers: list[tuple[int, str, str]] = []
+    in_operation = False
+    num_lines = 0
+    for num_lines, line in enumerate(data_lines, start=1):
+        if not line.startswith('# '):
+            continue
+        if line.startswith('# Group:'):
+            markers.append((num_lines - 1, 'group', line[8:].strip()))
+            in_operation = False
+        elif line.startswith('# Region:'):
+            markers.append((num_lines - 1, 'region', ''))
+            in_operation = False
+        elif in_operation:
+            # skip everything of an operation up to the next region
+            continue
+        elif line.startswith('# Cycle:'):
+            cycle_nr = line.split(',')[0].split()[-1]
+            markers.append((num_lines - 1, 'cycle', cycle_nr))
+        elif line.startswith('# Operation: '):
+            # if the file contains any operations, drop them right away
+            # TODO: Could be implemented to keep them with a different name,
+            #   but I don't see the point
+            markers.append((num_lines - 1, 'operation', ''))
+            in_operation = True
+
+    # ... then build the hierarchy, every block ends at the next marker
+    first_group = next((i for i, kind, _ in markers if kind == 'group'),
+                       num_lines)
+    index = XYFileIndex(range(first_group))
+    for k, (i, kind, value) in enumerate(markers):
+        stop = markers[k+1][0] if k+1 < len(markers) else num_lines
+        if kind == 'group':
+            index.groups.append(XYGroupIndex(i, value))
+        elif kind == 'region' and index.groups:
+            index.groups[-1].regions.append(XYRegionIndex(range(i, stop)))
+        elif kind == 'cycle' and index.groups and index.groups[-1].regions:
+            cycles = index.groups[-1].regions[-1].cycles
+            if not cycles or cycles[-1].number != value:
+                # pure header block
+                cycles.append(XYCycleIndex(value, range(i, stop)))
             else:
-                # contains data -> create a data block
-                use_lines = (data_lines[sub_idx[i]:sub_idx[i+1]]
-                             if i+1 < len(sub_idx)
-                             else data_lines[sub_idx[i]:])
-                data_block = Specs_XY_Data_Block(use_lines, header_parameters)
-                data_block.sweeps = sweeps  # from general header
-                data_block.cycle = int(cycle_nr) + 1
-                if parameters:
-                    data_block.parameters = ', '.join(parameters)
-                if 'Scan: ' in data_lines[sub_idx[i]]:
-                    data_block.scan = int(data_lines[sub_idx[i]]
-                                          .strip().split()[-1]) + 1
-                if cycle_nr in data_per_cycle:
-                    data_per_cycle[cycle_nr].append(data_block)
-                else:
-                    data_per_cycle[cycle_nr] = [data_block]
-                total_data += 1
-            last_cycle_nr = cycle_nr
-
-        # at this point we have all the data - now decide whether to write
-        #  directly as regions, or make another folder (in case of loops etc):
-        if total_data == 1:
-            # only one data block - just write it
-            return data_block.write_as_region()
-        print_cycle = True if len(data_per_cycle) > 1 else False
-        print_scan = (True if any(len(v) > 1 for v in data_per_cycle.values())
-                       else False)
-        out = ''
-        if print_cycle:
-            out += f'''[Folder]
+                # contains data
+                cycles[-1].scans.append(range(i, stop))
+
+    # a region without any data (e.g. an aborted measurement) would be
+    # counted in the folder of its group but written as nothing
+    for group in index.groups:
+        group.regions = [region for region in group.regions
+                         if any(cycle.scans for cycle in region.cycles)]
+
+    return index
+
+
+def index_xy_file(source_file: Path) -> XYFileIndex:
+    '''
+    Build the line index of an XY file, see `index_xy_lines`.
+    '''
+    with open(source_file, encoding='latin-1') as readfile:
+        return index_xy_lines(readfile)
+
+
+def parse_xy_region(data_lines: Sequence[str],
+                    region: XYRegionIndex,
+                    group: str='',
+                    offset: int=0,
+                    header_colwidth: int=32) -> XYRegion:
+    '''
+    Parse the header and the data blocks of an indexed region.
+
+    Parameters
+    ----------
+    data_lines : sequence of str
+        Lines containing the region.
+    region : XYRegionIndex
+        The index of the region.
+    group : str
+        The name of the group of the region.
+    offset : int
+        Line number of data_lines[0] in the indexed file.
+    header_colwidth : int
+        Width of the key column of the header lines.
+
+    Returns
+    -------
+    XYRegion
+        The parsed region.
+    '''
+    def get_lines(line_range: range) -> Iterator[str]:
+        return (data_lines[i - offset] for i in line_range)
+
+    # everything up until the first Cycle is general header:
+    header_parameters = {}
+    comment = ''
+    notes = ''
+    for line in get_lines(region.header):
+        left_side = line[:header_colwidth].strip()
+        right_side = line[header_colwidth:].strip()
+        if left_side in SPECS_TO_KOLXPD_HEADER:
+            header_parameters[SPECS_TO_KOLXPD_HEADER[left_side]] = right_side
+        elif left_side == '# Scan Variable:':
+             header_parameters['AxisBindingEn'] = '0' if 'Kinetic' in right_side else '1'
+        elif left_side == '# Dwell Time:':
+            try:
+                dw = float(right_side)*1000  # s to ms
+            except ValueError:
+                dw = 0
+            header_parameters['Dwell']=f'{dw:0.0f}'
+        elif line.startswith('# Comment:'):
+            comment = f'comment: {right_side}#0D#0A' if right_side else ''
+        else:
+            # collect everything unused up to this point into the notes
+            notes += f'{left_side[2:]} {right_side}#0D#0A'
+    header_parameters['Notes'] = comment + notes
+
+    sweeps = ''
+    data_per_cycle = {}
+    for cycle in region.cycles:
+        # pure header block - process
+        parameters = []
+        for line in get_lines(cycle.header):
+            if line.startswith('# Number of Scans:'):
+                sweeps = line.split()[-1].strip()
+            elif line.startswith('# Parameter:'):
+                parameters.append(line.split('# Parameter:')[-1].strip())
+        for scan in cycle.scans:
+            # contains data -> create a data block
+            data_block = Specs_XY_Data_Block(get_lines(scan), header_parameters)
+            data_block.sweeps = sweeps  # from general header
+            data_block.cycle = int(cycle.number) + 1
+            if parameters:
+                data_block.parameters = ', '.join(parameters)
+            scan_line = data_lines[scan.start - offset]
+            if 'Scan: ' in scan_line:
+                data_block.scan = int(scan_line.strip().split()[-1]) + 1
+            data_per_cycle.setdefault(cycle.number, []).append(data_block)
+
+    return XYRegion(group, header_parameters, data_per_cycle)
+
+
+def iter_xy_regions(source_file: Path,
+                    index: XYFileIndex | None=None) -> Iterator[XYRegion]:
+    '''
+    Read the regions of an XY file exported from SpecsLabs Prodigy one at a
+    time. The file is read incrementally, only the lines of the current
+    region are held in memory.
+
+    Parameters
+    ----------
+    source_file : Path
+        The XY file.
+    index : XYFileIndex
+        The index of the file, built with `index_xy_file` if not passed.
+
+    Yields
+    ------
+    XYRegion
+        The parsed regions in the order of the file.
+    '''
+    if index is None:
+        index = index_xy_file(source_file)
+
+    with open(source_file, encoding='latin-1') as readfile:
+        position = 0    # number of lines read so far
+        for group in index.groups:
+            for region in group.regions:
+                for _ in itertools.islice(readfile,
+                                          region.header.start - position):
+                    pass
+                region_lines = list(itertools.islice(
+                    readfile, region.stop - region.header.start))
+                position = region.stop
+                yield parse_xy_region(region_lines, region, group.name,
+                                      offset=region.header.start)
+
+
+def write_xy_region(f: TextIO, region: XYRegion,
+                    precision: int | None=6,
+                    profile: FileProfile | None=None) -> None:
+    '''
+    Write a parsed region as KolXPD region(s). Loops and profiling regions
+    are written as a folder with one region per cycle. The averaging and
+    rendering are recorded in `profile`.
+    '''
+    if profile is None:
+        profile = NullFileProfile()
+    data_per_cycle = region.data_per_cycle
+    header_parameters = region.header_parameters
+    total_data = sum(len(v) for v in data_per_cycle.values())
+
+    # at this point we have all the data - now decide whether to write
+    #  directly as regions, or make another folder (in case of loops etc):
+    if total_data == 1:
+        # only one data block - just write it
+        data_block = next(iter(data_per_cycle.values()))[0]
+        with profile.stage('render') as stats:
+            f.write(data_block.write_as_region(precision=precision))
+            stats.points += len(data_block.data)
+            stats.regions += 1
+        return
+    print_cycle = True if len(data_per_cycle) > 1 else False
+    print_scan = (True if any(len(v) > 1 for v in data_per_cycle.values())
+                   else False)
+    if print_cycle:
+        f.write(f'''[Folder]
 KolXPDversion=1.8.0.69
 Title={header_parameters['Title']}
 NotesHTML=0
@@ -234,65 +485,67 @@ timeStart=0
 timeEnd=0
 Color=0
 ItemCount={total_data}
-'''
-        for cycle_nr in data_per_cycle:
-            if len(data_per_cycle[cycle_nr]) > 1:
-                # also write an overall region with averaged data
+''')
+    for cycle_nr in data_per_cycle:
+        if len(data_per_cycle[cycle_nr]) > 1:
+            # also write an overall region with averaged data
+            with profile.stage('averaging') as stats:
                 avg_block = get_data_avg(data_per_cycle[cycle_nr])
-                avg_block.sweeps = f'{len(data_per_cycle[cycle_nr])}'
-                avg_block.header_parameters['ItemCount'] = f'{avg_block.sweeps}'
-                out += avg_block.write_as_region(print_cycle=print_cycle,
-                                                 print_scan=False,
-                                                 parameters_as_notes=True,
-                                                 no_region_end=True)
+                stats.points += sum(len(block.data)
+                                    for block in data_per_cycle[cycle_nr])
+            avg_block.sweeps = f'{len(data_per_cycle[cycle_nr])}'
+            avg_block.header_parameters['ItemCount'] = f'{avg_block.sweeps}'
+            with profile.stage('render') as stats:
+                f.write(avg_block.write_as_region(print_cycle=print_cycle,
+                                                  print_scan=False,
+                                                  parameters_as_notes=True,
+                                                  no_region_end=True,
+                                                  precision=precision))
+                stats.points += len(avg_block.data)
+                stats.regions += 1
+        with profile.stage('render') as stats:
             for data_block in data_per_cycle[cycle_nr]:
-                out += data_block.write_as_region(print_cycle=print_cycle,
-                                                  print_scan=print_scan,
-                                                  parameters_as_notes=True)
+                f.write(data_block.write_as_region(print_cycle=print_cycle,
+                                                   print_scan=print_scan,
+                                                   parameters_as_notes=True,
+                                                   precision=precision))
+                stats.points += len(data_block.data)
+                stats.regions += 1
             if len(data_per_cycle[cycle_nr]) > 1:
-                out += '[EndRegion]\n'
-        if print_cycle:
-            out += '[EndFolder]\n'
-        return out
+                f.write('[EndRegion]\n')
+    if print_cycle:
+        f.write('[EndFolder]\n')
 
-    def process_group(data_lines: list[str]) -> str:
-        group_name = data_lines[0][8:].strip()   # line starts with '# Group:'
-        sub_idx = [i for i in range(len(data_lines))
-                   if data_lines[i].startswith('# Region:')]
-        out = f'''[Folder]
-KolXPDversion=1.8.0.69
-Title={group_name}
-NotesHTML=0
-Notes=
-timeStart=0
-timeEnd=0
-Color=0
-ItemCount={len(sub_idx)}
-'''
-        for i in range(len(sub_idx)):
-            out += (process_region(data_lines[sub_idx[i]:sub_idx[i+1]])
-                    if i+1 < len(sub_idx)
-                    else process_region(data_lines[sub_idx[i]:]))
-        
-        out += '[EndFolder]\n'
-        return out
-        
 
+def write_specs_prodigy_xy(source_file: Path, f: TextIO,
+                           precision: int | None=6,
+                           profile: FileProfile | None=None) -> None:
+    '''
+    Writes a KolXPD file from an XY file exported from SpecsLabs Prodigy to
+    an open text file. The XY file is indexed first and then converted region
+    by region, so the memory needed is set by the largest region.
+    That file must contain exactly one loop (also works for profiling).
+    The counts are written with `precision` decimals, or in their shortest
+    round-trip representation if `precision` is None.
+    The time spent in each stage is recorded in `profile`.
+    '''
     print(f'Converting {source_file}')
-    with open(source_file, encoding='latin-1') as readfile:
-        data_lines = readfile.readlines()
-
-    sub_idx = [i for i in range(len(data_lines))
-                   if data_lines[i].startswith('# Group:')]
-    if not sub_idx:
+    if profile is None:
+        profile = NullFileProfile()
+    with profile.stage('header parse') as stats:
+        index = index_xy_file(source_file)
+        stats.bytes_read += source_file.stat().st_size
+    if not index.groups:
         print("File contains no groups!")
-        return
+        raise ValueError(f'{source_file} contains no groups')
 
     # everything up until the first Group is general header:
     notes = ''      # collect unused metadata to add to KolXPD notes
-    for line in data_lines[:sub_idx[0]]:
-        notes += '#' + line.strip() + '#0D#0A'
-    out = f'''[Folder]
+    with profile.stage('header parse'):
+        with open(source_file, encoding='latin-1') as readfile:
+            for line in itertools.islice(readfile, index.header.stop):
+                notes += '#' + line.strip() + '#0D#0A'
+    f.write(f'''[Folder]
 KolXPDversion=1.8.0.69
 Title={source_file.name}
 NotesHTML=0
@@ -300,15 +553,46 @@ Notes={notes}
 timeStart=0
 timeEnd=0
 Color=0
-ItemCount={len(sub_idx)}
-'''
-        
+ItemCount={len(index.groups)}
+''')
+
     # now process each group:
-    for i in range(len(sub_idx)):
-        out += (process_group(data_lines[sub_idx[i]:sub_idx[i+1]])
-                if i+1 < len(sub_idx)
-                else process_group(data_lines[sub_idx[i]:]))
+    regions = iter_xy_regions(source_file, index)
+    for group in index.groups:
+        f.write(f'''[Folder]
+KolXPDversion=1.8.0.69
+Title={group.name}
+NotesHTML=0
+Notes=
+timeStart=0
+timeEnd=0
+Color=0
+ItemCount={len(group.regions)}
+''')
+        for _ in group.regions:
+            with profile.stage('data decode') as stats:
+                region = next(regions)
+                stats.points += sum(len(block.data)
+                                    for blocks in region.data_per_cycle.values()
+                                    for block in blocks)
+            write_xy_region(f, region, precision, profile)
+        f.write('[EndFolder]\n')
+
+    with profile.stage('data decode') as stats:
+        # the regions were read in one more pass over the file
+        stats.bytes_read += source_file.stat().st_size
 
     # wrap up
-    out += '[EndFolder]'
-    return out
+    f.write('[EndFolder]')
+
+
+def convert_specs_prodigy_xy(source_file: Path,
+                             precision: int | None=6,
+                             profile: FileProfile | None=None) -> str:
+    '''
+    Creates a KolXPD file from an XY file exported from SpecsLabs Prodigy and
+    returns it as a string, see `write_specs_prodigy_xy`.
+    '''
+    out = io.StringIO()
+    write_specs_prodigy_xy(source_file, out, precision, profile)
+    return out.getvalue()
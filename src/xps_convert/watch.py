@@ -0,0 +1,183 @@
+import time
+import traceback
+from concurrent.futures import Executor, Future, wait
+from pathlib import Path
+
+from xps_convert.cache import ConversionCache, hash_inputs
+from xps_convert.conversion import (
+    Conversion,
+    ConversionResult,
+    OutputFormat,
+    conversion_options,
+    plan_conversions,
+    run_conversion,
+)
+from xps_convert.igor_to_kolxpd import IGOR_SAMPLE_PATTERN, IGOR_SUFFIXES
+
+# Size and modification time of a file, a file whose state is unchanged
+# between two polls is not being written anymore
+FileState = tuple[int, int]
+
+
+def file_states(folder: Path, suffixes: tuple[str, ...]) -> dict[Path, FileState]:
+    """Get the states of the files in folder with one of the (lowercase) suffixes"""
+    states: dict[Path, FileState] = {}
+    for file in folder.iterdir():
+        if file.suffix.lower() not in suffixes:
+            continue
+        try:
+            stat = file.stat()
+        except FileNotFoundError:
+            # removed since listing the folder
+            continue
+        states[file] = (stat.st_size, stat.st_mtime_ns)
+    return states
+
+
+class StableFiles:
+    """
+    Change detection for the files of a folder by polling.
+
+    A file is stable once its size and modification time have not changed
+    for `settle` seconds. Each call of `poll` returns the files that became
+    stable in a state that was not reported before, so a file that is
+    written again is reported again once it is stable. A reported file that
+    is removed is reported once more.
+
+    Args:
+        folder: The folder to watch
+        suffixes: Lowercase suffixes of the files to watch, e.g. `(".xy",)`
+        settle: Seconds a file must stay unchanged to be stable
+    """
+
+    def __init__(self, folder: Path, suffixes: tuple[str, ...], settle: float = 2.0):
+        self.folder = folder
+        self.suffixes = suffixes
+        self.settle = settle
+        # the current state of each file and since when it is unchanged
+        self.states: dict[Path, tuple[FileState, float]] = {}
+        self.reported: dict[Path, FileState] = {}
+
+    @property
+    def stable(self) -> list[Path]:
+        """All files that are stable as of the last poll"""
+        return sorted(file for file, state in self.reported.items() if self.states[file][0] == state)
+
+    def poll(self, now: float | None = None) -> list[Path]:
+        """Update the states of the files and get the files that became stable or were removed"""
+        if now is None:
+            now = time.monotonic()
+        current = file_states(self.folder, self.suffixes)
+        changed: list[Path] = []
+        for file in self.states.keys() - current.keys():
+            del self.states[file]
+            if self.reported.pop(file, None) is not None:
+                changed.append(file)
+
+        for file, state in current.items():
+            previous = self.states.get(file)
+            if previous is None or previous[0] != state:
+                self.states[file] = (state, now)
+            elif now - previous[1] >= self.settle and self.reported.get(file) != state:
+                self.reported[file] = state
+                changed.append(file)
+        return sorted(changed)
+
+
+class Watcher:
+    """
+    Converts the files of a folder as they are written.
+
+    Every `poll` looks for files that became stable (see `StableFiles`) and
+    queues the conversions containing them, i.e. only the samples with new,
+    changed or removed files are converted again. At most one conversion per output
+    file runs at a time, a conversion whose files change while it runs is
+    queued again and started once it finished. Unchanged conversions are
+    skipped with the manifest of the folder (see `ConversionCache`).
+
+    Args:
+        folder: The folder to watch
+        executor: Runs the conversions, its number of workers bounds the
+            number of concurrent conversions
+        settle: Seconds a file must stay unchanged before it is converted
+        group_pattern: See `plan_conversions`
+        output_format: See `plan_conversions`
+    """
+
+    def __init__(
+        self,
+        folder: Path,
+        executor: Executor,
+        settle: float = 2.0,
+        group_pattern: str = IGOR_SAMPLE_PATTERN,
+        output_format: OutputFormat = OutputFormat.exp,
+    ):
+        self.files = StableFiles(folder, (".xy", *IGOR_SUFFIXES), settle)
+        self.executor = executor
+        self.group_pattern = group_pattern
+        self.output_format = output_format
+        self.cache = ConversionCache(folder)
+        # the output file of each stable file as of the last change
+        self.outputs: dict[Path, Path] = {}
+        self.queued: dict[Path, Conversion] = {}
+        self.running: dict[Path, tuple[Conversion, dict[str, str], Future[ConversionResult]]] = {}
+
+    def poll(self, now: float | None = None) -> None:
+        """Finish completed conversions and start the conversions of changed files"""
+        self.collect()
+        changed = set(self.files.poll(now))
+        if changed:
+            conversions = plan_conversions(self.files.stable, self.group_pattern, self.output_format)
+            # a removed file is not part of any conversion anymore, but the
+            # remaining files of its sample are converted again
+            out_files = {self.outputs[file] for file in changed if file in self.outputs}
+            self.outputs = {
+                file: conversion.out_file for conversion in conversions for file in conversion.files
+            }
+            for conversion in conversions:
+                if conversion.out_file in out_files or changed.intersection(conversion.files):
+                    self.queued[conversion.out_file] = conversion
+
+        for out_file, conversion in list(self.queued.items()):
+            if out_file not in self.running:
+                del self.queued[out_file]
+                self.submit(conversion)
+
+    def submit(self, conversion: Conversion) -> None:
+        options = conversion_options(conversion, self.group_pattern)
+        try:
+            input_hashes = hash_inputs(conversion.files)
+        except OSError as e:
+            print(f"Failed to read {conversion.description}: {e}")
+            return
+        if self.cache.is_fresh(conversion.out_file, input_hashes, options):
+            print(f"Skipping unchanged {conversion.description}")
+            return
+
+        future = self.executor.submit(run_conversion, conversion)
+        self.running[conversion.out_file] = (conversion, input_hashes, future)
+
+    def collect(self) -> None:
+        """Report the finished conversions and record them in the manifest"""
+        for out_file, (conversion, input_hashes, future) in list(self.running.items()):
+            if not future.done():
+                continue
+
+            del self.running[out_file]
+            try:
+                result = future.result()
+            except Exception:
+                # e.g. a worker process was killed
+                result = ConversionResult(traceback.format_exc(), 0.0)
+            if result.error is not None:
+                print(f"Failed to convert {conversion.description}:")
+                print(result.error)
+                continue
+
+            self.cache.record(out_file, input_hashes, conversion_options(conversion, self.group_pattern))
+        self.cache.save()
+
+    def close(self) -> None:
+        """Wait for the running conversions, the queued ones are dropped"""
+        _ = wait([future for _, _, future in self.running.values()])
+        self.collect()
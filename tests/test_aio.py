@@ -0,0 +1,132 @@
+import asyncio
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from xps_convert import aio
+from xps_convert.aio import AsyncConverter, convert_file
+from xps_convert.conversion import Conversion, run_conversion
+
+testdata = Path(__file__).parent / "testdata"
+
+
+def test_convert_file(tmp_path: Path):
+    source = Path(shutil.copy(testdata / "group.xy", tmp_path))
+    expected = tmp_path / "expected.exp"
+    assert run_conversion(Conversion(source.name, [source], expected)).error is None
+
+    # in the default executor
+    assert asyncio.run(convert_file(source)) == tmp_path / "group.exp"
+    assert (tmp_path / "group.exp").read_bytes() == expected.read_bytes()
+
+    with pytest.raises(ValueError, match="not a file that can be converted"):
+        _ = asyncio.run(convert_file(tmp_path / "notes.txt"))
+
+
+def test_convert_igor_files_of_a_sample(tmp_path: Path):
+    files = [
+        Path(shutil.copy(testdata / name, tmp_path))
+        for name in ["Sample1-10002.pxt", "Sample1-10005.pxt"]
+    ]
+
+    async def convert() -> list[Path]:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            return await asyncio.gather(*(convert_file(file, executor=executor) for file in files))
+
+    # each file on its own, not both into the file of the sample
+    assert asyncio.run(convert()) == [file.with_suffix(".exp") for file in files]
+    assert (tmp_path / "Sample1-10002.exp").read_text().splitlines()[8] == "ItemCount=1"
+    assert (tmp_path / "Sample1-10005.exp").read_text().splitlines()[8] == "ItemCount=3"
+    assert not (tmp_path / "Sample1-1.exp").exists()
+
+
+def test_convert_files(tmp_path: Path):
+    files = [
+        Path(shutil.copy(testdata / name, tmp_path))
+        for name in ["loop.xy", "Sample1-10002.pxt", "Sample1-10005.pxt"]
+    ]
+    bad = tmp_path / "bad.xy"
+    _ = bad.write_text("not an xy file\n")
+
+    async def convert() -> list[Path | BaseException]:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            return await AsyncConverter(executor, limit=2).convert_files([*files, bad])
+
+    loop_exp, bad_exp, sample_exp = asyncio.run(convert())
+    assert loop_exp == tmp_path / "loop.exp"
+    assert sample_exp == tmp_path / "Sample1-1.exp"
+    assert sample_exp.read_text().splitlines()[8] == "ItemCount=4"
+    assert isinstance(bad_exp, Exception)
+    assert not list(tmp_path.glob("*.part"))
+
+
+def test_concurrency_limit(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    running = 0
+    most_running = 0
+    lock = threading.Lock()
+
+    def write_conversion(conversion: Conversion, part_file: Path, *_: object) -> None:
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        time.sleep(0.05)
+        _ = part_file.write_text(conversion.name)
+        with lock:
+            running -= 1
+
+    monkeypatch.setattr(aio, "write_conversion", write_conversion)
+    files = [tmp_path / f"{i}.xy" for i in range(6)]
+    for file in files:
+        _ = file.write_text("")
+
+    async def convert() -> tuple[list[Path | BaseException], int]:
+        ticks = 0
+
+        async def heartbeat() -> None:
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(heartbeat())
+        with ThreadPoolExecutor(max_workers=6) as executor:
+            results = await AsyncConverter(executor, limit=2).convert_files(files)
+        _ = task.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(convert())
+    assert results == [file.with_suffix(".exp") for file in files]
+    assert most_running == 2
+    # the event loop kept running during the conversions
+    assert ticks > 5
+
+
+def test_cancel(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    started = threading.Event()
+    release = threading.Event()
+
+    def write_conversion(conversion: Conversion, part_file: Path, *_: object) -> None:
+        started.set()
+        _ = release.wait(5)
+        _ = part_file.write_text(conversion.name)
+
+    monkeypatch.setattr(aio, "write_conversion", write_conversion)
+    source = tmp_path / "spectrum.xy"
+    _ = source.write_text("")
+
+    async def cancel() -> None:
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            task = asyncio.create_task(convert_file(source, executor=executor))
+            _ = await asyncio.to_thread(started.wait, 5)
+            _ = task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+            release.set()
+
+    asyncio.run(cancel())
+    assert sorted(file.name for file in tmp_path.iterdir()) == ["spectrum.xy"]
@@ -0,0 +1,71 @@
+import shutil
+from pathlib import Path
+
+import numpy as np
+from typer.testing import CliRunner
+
+import igor
+from xps_convert.columnar import (
+    ColumnarSpectra,
+    igor_spectra,
+    write_columnar,
+    xy_spectra,
+)
+from xps_convert.main import app
+from xps_convert.specs_xy_to_kolxpd import iter_xy_regions
+
+testdata = Path(__file__).parent / "testdata"
+
+PXT_CYCLED = testdata / "Sample1-10026.pxt"
+
+
+def test_igor_columnar(tmp_path: Path):
+    path = tmp_path / "cycled.npz"
+    write_columnar(path, igor_spectra("cycled", [PXT_CYCLED]))
+
+    spectra = ColumnarSpectra(path)
+    assert isinstance(spectra.values, np.memmap)
+    assert len(spectra) == 24
+    assert list(spectra.columns["cycle"]) == list(range(1, 25))
+    assert set(spectra.columns["sample"]) == {"cycled"}
+    assert set(spectra.columns["region"]) == {"Pt4f_307_cycleSample1-1026"}
+    assert set(spectra.columns["pass_energy"]) == {100}
+
+    wave = igor.PackedFile(str(PXT_CYCLED)).records[0]
+    data = wave.data.reshape(24, 401)
+    for i in range(24):
+        assert np.array_equal(spectra[i], data[i])
+    assert spectra.energies(0)[0] == wave.wave_header.sf_b[0]
+    assert np.isclose(spectra.energies(0)[1] - spectra.energies(0)[0], wave.wave_header.sf_a[0])
+
+
+def test_xy_columnar(tmp_path: Path):
+    source = testdata / "export_with_scans.xy"
+    blocks = [
+        block
+        for region in iter_xy_regions(source)
+        for data_blocks in region.data_per_cycle.values()
+        for block in data_blocks
+    ]
+    for compress in [False, True]:
+        path = tmp_path / f"scans{compress}.npz"
+        write_columnar(path, xy_spectra(source), compress=compress)
+        spectra = ColumnarSpectra(path)
+        assert isinstance(spectra.values, np.memmap) != compress
+        assert len(spectra) == len(blocks)
+        for i, block in enumerate(blocks):
+            assert np.array_equal(spectra[i], block.data[:, 1])
+            assert np.allclose(spectra.energies(i), block.data[:, 0])
+            assert spectra.columns["scan"][i] == block.scan
+        assert set(spectra.columns["pass_energy"]) == {30, 60}
+
+
+def test_convert_format_npz(tmp_path: Path):
+    xy = shutil.copy(testdata / "loop.xy", tmp_path)
+    pxt = shutil.copy(PXT_CYCLED, tmp_path)
+
+    result = CliRunner().invoke(app, [str(xy), str(pxt), "--format", "npz"])
+    assert result.exit_code == 0
+    assert len(ColumnarSpectra(tmp_path / "loop.npz")) == 80
+    assert len(ColumnarSpectra(tmp_path / "Sample1-1.npz")) == 24
+    assert not list(tmp_path.glob("*.exp"))
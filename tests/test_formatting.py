@@ -0,0 +1,27 @@
+import io
+
+import numpy as np
+
+from xps_convert.formatting import format_values, write_values
+
+
+def test_format_values_round_trip():
+    values = np.array([1099.1099853515625, -0.05, 1e16, 0.1, 0.0])
+    text = format_values(values)
+    assert text == "1099.1099853515625\n-0.05\n1e+16\n0.1\n0.0\n"
+    assert np.array_equal(np.array(text.split(), dtype=np.float64), values)
+
+
+def test_format_values_precision():
+    values = np.array([547.668, 1.0, -2.5], dtype=np.float32)
+    assert format_values(values, 2) == "547.67\n1.00\n-2.50\n"
+    assert format_values(values, 6) == "\n".join(np.char.mod("%f", values)) + "\n"
+
+
+def test_write_values_chunked(monkeypatch):
+    monkeypatch.setattr("xps_convert.formatting.CHUNK_SIZE", 3)
+    values = np.arange(10, dtype=np.int32)
+    f = io.StringIO()
+    write_values(f, values, 1)
+    assert f.getvalue() == format_values(values, 1)
+    assert f.getvalue().splitlines() == [f"{i}.0" for i in range(10)]
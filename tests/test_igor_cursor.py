@@ -0,0 +1,81 @@
+from pathlib import Path
+import struct
+
+import numpy as np
+import pytest
+
+import igor
+from igor.cursor import Cursor, CursorError
+from igor.ibw import read_binary_wave
+
+testdata = Path(__file__).parent / "testdata"
+
+
+def test_cursor_reads_little_endian():
+    buffer = struct.pack("<BbHhIiQfd", 255, -1, 65535, -2, 2**32 - 1, -3, 2**64 - 1, 0.5, -0.25)
+    for source in [buffer, bytearray(buffer), memoryview(buffer)]:
+        cursor = Cursor(source)
+        assert cursor.read_u8_le() == 255
+        assert cursor.read_i8_le() == -1
+        assert cursor.read_u16_le() == 65535
+        assert cursor.read_i16_le() == -2
+        assert cursor.read_u32_le() == 2**32 - 1
+        assert cursor.read_i32_le() == -3
+        assert cursor.read_u64_le() == 2**64 - 1
+        assert cursor.read_f32_le() == 0.5
+        assert cursor.read_f64_le() == -0.25
+        assert cursor.position() == len(buffer) == len(cursor)
+
+
+def test_cursor_read_array_is_view():
+    values = np.arange(10, dtype="<f8")
+    buffer = b"head" + values.tobytes()
+    cursor = Cursor(buffer, 4)
+    array = cursor.read_array(np.dtype("<f8"), 10)
+    assert np.array_equal(array, values)
+    assert not array.flags.writeable
+    assert np.shares_memory(array, np.frombuffer(buffer, dtype=np.uint8))
+    assert cursor.position() == len(buffer)
+
+    # a non-byte memoryview is addressed in bytes
+    cursor = Cursor(memoryview(values), 8)
+    assert cursor.read_f64_le() == 1.0
+
+
+def test_cursor_bounds():
+    cursor = Cursor(b"\x01\x02\x03")
+    cursor.skip(2)
+    with pytest.raises(CursorError, match="at offset 2") as excinfo:
+        _ = cursor.read_u16_le()
+    assert excinfo.value.offset == 2
+    assert excinfo.value.num_bytes == 2
+    # the position is unchanged after a failed read
+    assert cursor.position() == 2
+    with pytest.raises(CursorError):
+        _ = cursor.read_array(np.dtype("<f4"), 1)
+    with pytest.raises(CursorError):
+        cursor.set_position(4)
+    with pytest.raises(ValueError):
+        _ = cursor.read(2)
+
+
+def test_truncated_ibw():
+    data = (testdata / "test_matrix.ibw").read_bytes()
+    with pytest.raises(CursorError, match="offset 384"):
+        _ = read_binary_wave(Cursor(data[:400]))
+
+
+def test_truncated_pxt(tmp_path: Path):
+    path = tmp_path / "truncated.pxt"
+    data = (testdata / "Sample1-10005.pxt").read_bytes()
+    _ = path.write_bytes(data[: len(data) - 10])
+    with pytest.raises(CursorError):
+        _ = igor.PackedFile(str(path))
+
+
+def test_read_string_ends_at_first_nul():
+    cursor = Cursor(b"name\x00garbage\x00abc")
+    assert cursor.read_string(13) == "name"
+    assert cursor.position() == 13
+    assert cursor.read_string(3) == "abc"
+    assert Cursor("µm".encode("utf-8")).read_string(3, "utf-8") == "µm"
@@ -1,7 +1,12 @@
+import io
 from pathlib import Path
 
+import numpy as np
+import pytest
+
 import igor
-from igor.ibw import WaveHeaderV5
+from igor.cursor import CursorError
+from igor.ibw import WaveHeaderV5, numeric_dtype
 
 testdata = Path(__file__).parent / "testdata"
 
@@ -228,3 +233,86 @@ def test_pxt_tr():
 
     end_data = [round(x, 3) for x in ibw.data[-3:]]
     assert end_data == [0.0, 0.0, 0.0]
+
+
+def test_pxt_memory_map():
+    pxt = igor.PackedFile(str(PXT_MULTIPLE))
+    mapped = igor.PackedFile(str(PXT_MULTIPLE), memory_map=True)
+    assert len(mapped.records) == len(pxt.records)
+
+    for wave, mapped_wave in zip(pxt.records, mapped.records):
+        assert mapped_wave.wave_header == wave.wave_header
+        assert mapped_wave.note == wave.note
+        assert mapped_wave.dim_e_units == wave.dim_e_units
+        assert mapped_wave.data.dtype == numeric_dtype(wave.wave_header.type_)
+        assert not mapped_wave.data.flags.writeable
+        assert np.array_equal(mapped_wave.data, wave.data)
+
+
+def test_pxt_lazy():
+    pxt = igor.PackedFile(str(PXT_MULTIPLE), lazy=True)
+    assert [entry.name for entry in pxt.index] == [
+        "Ce3d_1486-7Sample1-1005",
+        "Rh3d_1486-7Sample1-1005",
+        "Pt4f_1486-7Sample1-1005",
+    ]
+    assert [entry.n_dim for entry in pxt.index] == [
+        (1601, 0, 0, 0),
+        (1001, 0, 0, 0),
+        (301, 0, 0, 0),
+    ]
+    assert len(pxt.records) == 3
+
+    eager = igor.PackedFile(str(PXT_MULTIPLE))
+    ce_ibw = pxt.wave("Ce3d_1486-7Sample1-1005")
+    assert ce_ibw is pxt.records[0]
+    assert ce_ibw.wave_header == eager.records[0].wave_header
+    assert np.array_equal(ce_ibw.data, eager.records[0].data)
+    assert np.array_equal(pxt.records[-1].data, eager.records[-1].data)
+
+
+def test_pxt_close():
+    with igor.PackedFile(str(PXT_MULTIPLE), memory_map=True, lazy=True) as pxt:
+        wave = pxt.records[0]
+        data = wave.data.copy()
+    # the wave is still usable, it keeps the mapping alive
+    assert np.array_equal(wave.data, data)
+    with pytest.raises(ValueError, match="closed"):
+        _ = pxt.records[1]
+
+    # unmapped right away once no wave is in use
+    pxt = igor.PackedFile(str(PXT_MULTIPLE), memory_map=True, lazy=True)
+    mapping = pxt._mapping  # pyright: ignore[reportPrivateUsage]
+    assert pxt.records[0].data.size
+    pxt.close()
+    assert mapping is not None and mapping.closed
+
+
+def test_pxt_lazy_reads_only_headers(monkeypatch: pytest.MonkeyPatch):
+    expected = igor.PackedFile(str(PXT_MULTIPLE))
+    bytes_read = 0
+
+    class CountingFile(io.FileIO):
+        def read(self, size: int = -1) -> bytes:
+            nonlocal bytes_read
+            data = super().read(size)
+            bytes_read += len(data)
+            return data
+
+    monkeypatch.setattr(igor.packed, "open", lambda path, _: CountingFile(path), raising=False)
+    pxt = igor.PackedFile(str(PXT_MULTIPLE), lazy=True)
+    # a record header and the version 5 bin and wave headers per wave
+    assert bytes_read == pxt.bytes_parsed == 3 * (8 + 64 + 320)
+    assert pxt.index == expected.index
+
+    wave = pxt.records[1]
+    assert bytes_read == pxt.bytes_parsed + pxt.index[1].size
+    assert np.array_equal(wave.data, expected.records[1].data)
+
+
+def test_truncated_lazy_pxt(tmp_path: Path):
+    path = tmp_path / "truncated.pxt"
+    data = PXT_MULTIPLE.read_bytes()
+    _ = path.write_bytes(data[: len(data) - 10])
+    with pytest.raises(CursorError):
+        _ = igor.PackedFile(str(path), lazy=True)
@@ -0,0 +1,48 @@
+from pathlib import Path
+
+import numpy as np
+
+import igor
+from xps_convert.igor_to_kolxpd import average_rows, convert_igor, create_region
+
+testdata = Path(__file__).parent / "testdata"
+
+PXT_CYCLED = testdata / "Sample1-10026.pxt"
+
+
+def test_average_rows():
+    data = np.arange(7 * 5, dtype=np.float32).reshape(7, 5)
+    expected = np.average(data.astype(np.float64), axis=0)
+    assert np.array_equal(average_rows(data), expected)
+    # two rows per chunk
+    assert np.allclose(average_rows(data, chunk_size=10), expected)
+    assert average_rows(data, chunk_size=1).dtype == np.float64
+
+
+def test_convert_igor_cycled(tmp_path: Path):
+    out_file = tmp_path / "cycled.exp"
+    convert_igor("cycled", [PXT_CYCLED], out_file)
+    text = out_file.read_text()
+
+    assert text.startswith("[Folder]\nKolXPDversion=1.8.0.69\nTitle=cycled_generated\n")
+    assert text.endswith("[EndRegion]\n[EndFolder]")
+    # average and one region per cycle
+    assert text.count("[Region]") == 25
+    assert text.count("[EndRegion]") == 25
+    assert "Title=cycled__Pt4f_307_cycleSample1-1026 (avg)\n" in text
+    assert "Title=cycled__Pt4f_307_cycleSample1-1026 - 24\n" in text
+    # acquisition parameters from the SES note
+    assert text.count("PassEn=100\nExcitEn=307.0007851233\n") == 25
+    assert text.count("Dwell=96\nDwellSmart=96\n") == 25
+    assert text.count("LensMode=SwiftAcc_HiPP3L\n") == 25
+    assert text.count("Sweeps=24\n") == 1
+
+    wave = igor.PackedFile(str(PXT_CYCLED)).records[0]
+    data = wave.data.reshape(24, 401)
+    first_cycle = text.split("[Data]\n")[2].split("\n")[2:403]
+    assert np.array_equal(np.array(first_cycle, dtype=np.float64), data[0])
+
+
+def test_create_region_escapes_notes():
+    region = create_region("title", "a=1\nb=2", 0, 1, 1, 0, 1, np.zeros(2)).splitlines()
+    assert "Notes=a=1#0D#0Ab=2" in region
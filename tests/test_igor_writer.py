@@ -0,0 +1,124 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import igor
+from igor.ibw import BinHeaderV5, WaveHeaderV5, numeric_dtype, read_ibw
+from igor.writer import (
+    encode_binary_wave,
+    wave_checksum,
+    wave_type,
+    write_ibw,
+    write_packed_file,
+)
+
+testdata = Path(__file__).parent / "testdata"
+
+DTYPES = ["<f4", "<f8", "i1", "<i2", "<i4", "u1", "<u2", "<u4", "<c8", "<c16"]
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+def test_wave_type_round_trip(dtype: str):
+    assert numeric_dtype(wave_type(np.dtype(dtype))) == np.dtype(dtype)
+
+
+def test_checksum_of_existing_files():
+    for path, offset in [(testdata / "test_matrix.ibw", 0), (testdata / "Sample1-10002.pxt", 8)]:
+        headers = path.read_bytes()[offset : offset + 64 + 320]
+        assert wave_checksum(headers) == 0
+
+
+@pytest.mark.parametrize("dtype", DTYPES)
+@pytest.mark.parametrize("shape", [(7,), (5, 3), (4, 3, 2), (3, 2, 2, 2)])
+def test_ibw_round_trip(tmp_path: Path, dtype: str, shape: tuple[int, ...]):
+    data = (np.arange(np.prod(shape)) % 100).astype(dtype).reshape(shape)
+    if data.dtype.kind == "c":
+        data += 1j * np.flip(data.real)
+    path = tmp_path / "wave.ibw"
+    write_ibw(
+        str(path),
+        encode_binary_wave(
+            data,
+            "wave0",
+            note="line 1\nline 2",
+            start=(86.0, 1.0),
+            step=(-0.05, 2.0),
+            data_units="cps",
+            extended_data_units="Counts [a.u.]",
+            dim_e_units=["Binding Energy [eV]", "Iteration"][: len(shape)],
+            dim_labels=["energy"],
+        ),
+    )
+
+    wave = read_ibw(str(path))
+    assert isinstance(wave.bin_header, BinHeaderV5)
+    assert isinstance(wave.wave_header, WaveHeaderV5)
+    assert wave.wave_header.bname == "wave0"
+    assert wave.wave_header.type_ == wave_type(np.dtype(dtype))
+    assert wave.wave_header.n_dim == shape + (0,) * (4 - len(shape))
+    assert wave.wave_header.sf_b == (86.0, 1.0, 0, 0)
+    assert wave.wave_header.sf_a == (-0.05, 2.0, 1, 1)
+    assert wave.wave_header.data_units == "cps"
+    assert wave.note == "line 1\nline 2"
+    assert wave.extended_data_units == "Counts [a.u.]"
+    assert wave.dim_e_units == ["Binding Energy [eV]", "Iteration"][: len(shape)]
+    assert wave.dim_labels == ["energy"] + [""] * (len(shape) - 1)
+    np.testing.assert_array_equal(wave.data.reshape(shape, order="F"), data)
+    assert wave_checksum(path.read_bytes()[: 64 + 320]) == 0
+
+
+def test_packed_file_round_trip(tmp_path: Path):
+    rng = np.random.default_rng(0)
+    spectra = [rng.uniform(0, 1e4, (100, 5)), rng.uniform(0, 1e4, 80)]
+    path = tmp_path / "waves.pxt"
+    write_packed_file(
+        str(path),
+        (encode_binary_wave(data, f"wave{i}") for i, data in enumerate(spectra)),
+    )
+
+    for pxt in [
+        igor.PackedFile(str(path)),
+        igor.PackedFile(str(path), memory_map=True),
+        igor.PackedFile(str(path), memory_map=True, lazy=True),
+    ]:
+        assert [entry.name for entry in pxt.index] == ["wave0", "wave1"]
+        for wave, data in zip(pxt.records, spectra):
+            n_dim = wave.wave_header.n_dim
+            assert isinstance(wave.wave_header, WaveHeaderV5)
+            np.testing.assert_array_equal(
+                wave.data.reshape(data.shape, order="F"), data
+            )
+            assert n_dim[: data.ndim] == data.shape
+
+
+def test_encode_does_not_copy_igor_ordered_data():
+    data = np.asfortranarray(np.ones((10, 3)))
+    wave = encode_binary_wave(data, "wave")
+    assert np.shares_memory(np.frombuffer(wave[2], dtype=np.float64), data)
+
+
+def test_encode_invalid_waves():
+    with pytest.raises(ValueError):
+        encode_binary_wave(np.ones((1, 1, 1, 1, 1)), "wave")
+    with pytest.raises(ValueError):
+        encode_binary_wave(np.ones(3), "w" * 32)
+    with pytest.raises(ValueError):
+        encode_binary_wave(np.ones(3, dtype=bool), "wave")
+
+
+@pytest.mark.parametrize("encoding", ["latin-1", "mac_roman", "utf-8"])
+def test_note_encoding(tmp_path: Path, encoding: str):
+    note = "Sample temperature=300 °C\nSpot size=50 µm"
+    path = tmp_path / "wave.pxt"
+    write_packed_file(
+        str(path), [encode_binary_wave(np.ones(3), "wave", note=note, note_encoding=encoding)]
+    )
+
+    wave = igor.PackedFile(str(path), note_encoding=encoding).records[0]
+    assert wave.note == note
+
+    lazy = igor.PackedFile(str(path), note_encoding=encoding, lazy_notes=True).records[0]
+    assert "note" not in vars(lazy)
+    assert lazy.note == note
+    assert "note" in vars(lazy)
@@ -0,0 +1,112 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import igor
+from xps_convert.igor_to_kolxpd import convert_igor
+from xps_convert.kolxpd import ExpFile, ExpFolder, ExpRegion, merge_exp
+from xps_convert.specs_xy_to_kolxpd import iter_xy_regions, write_specs_prodigy_xy
+
+testdata = Path(__file__).parent / "testdata"
+
+PXT_CYCLED = testdata / "Sample1-10026.pxt"
+
+
+def test_read_igor_exp(tmp_path: Path):
+    out_file = tmp_path / "cycled.exp"
+    convert_igor("cycled", [PXT_CYCLED], out_file)
+
+    with ExpFile(out_file) as exp:
+        assert len(exp.items) == 1
+        folder = exp.items[0]
+        assert isinstance(folder, ExpFolder)
+        assert folder.title == "cycled_generated"
+        assert folder.header["ItemCount"] == "1"
+        assert folder.offset == 0
+        assert folder.end == out_file.stat().st_size
+
+        (average,) = folder.children
+        assert isinstance(average, ExpRegion)
+        assert average.title == "cycled__Pt4f_307_cycleSample1-1026 (avg)"
+        assert len(average.children) == 24
+        assert len(exp.regions) == 25
+
+        wave = igor.PackedFile(str(PXT_CYCLED)).records[0]
+        data = wave.data.reshape(24, 401)
+        assert np.allclose(exp.data(average), data.mean(axis=0))
+        region = exp.region("cycled__Pt4f_307_cycleSample1-1026 - 2")
+        assert np.array_equal(exp.data(region), data[1])
+        assert region.start == wave.wave_header.sf_b[0]
+        assert region.step == wave.wave_header.sf_a[0]
+        assert exp.raw(region).startswith(b"[Region]\n")
+        assert exp.raw(region).endswith(b"[EndRegion]\n")
+
+
+def test_read_xy_exp(tmp_path: Path):
+    source = testdata / "export_with_scans.xy"
+    out_file = tmp_path / "scans.exp"
+    with open(out_file, "w") as f:
+        write_specs_prodigy_xy(source, f)
+
+    blocks = [
+        block
+        for region in iter_xy_regions(source)
+        for data_blocks in region.data_per_cycle.values()
+        for block in data_blocks
+    ]
+    with ExpFile(out_file) as exp:
+        (top,) = exp.items
+        assert isinstance(top, ExpFolder)
+        assert top.title == "export_with_scans.xy"
+        # the averages of the scans are regions too
+        scans = [region for region in exp.regions if "(avg)" not in region.title and not region.children]
+        assert len(scans) == len(blocks)
+        for region, block in zip(scans, blocks):
+            assert np.allclose(exp.data(region), block.data[:, 1], rtol=1e-6)
+            assert np.allclose(exp.energies(region)[0], block.data[0, 0], atol=0.01)
+
+
+def test_read_malformed_exp(tmp_path: Path):
+    path = tmp_path / "bad.exp"
+    _ = path.write_text("[Folder]\nTitle=x\n[Region]\nTitle=y\n[EndFolder]")
+    with pytest.raises(ValueError, match="Unexpected \\[EndFolder\\]"):
+        _ = ExpFile(path)
+
+    _ = path.write_text("[Folder]\nTitle=x\n")
+    with pytest.raises(ValueError, match="ends inside"):
+        _ = ExpFile(path)
+
+
+def test_merge_exp(tmp_path: Path):
+    igor_file = tmp_path / "cycled.exp"
+    convert_igor("cycled", [PXT_CYCLED], igor_file)
+    xy_file = tmp_path / "group.exp"
+    with open(xy_file, "w") as f:
+        write_specs_prodigy_xy(testdata / "group.xy", f)
+
+    merged = tmp_path / "merged.exp"
+    with open(merged, "wb") as f:
+        assert merge_exp([igor_file, xy_file], f, "beamtime") == 2
+
+    with ExpFile(merged) as exp, ExpFile(igor_file) as igor_exp, ExpFile(xy_file) as xy_exp:
+        (top,) = exp.items
+        assert isinstance(top, ExpFolder)
+        assert top.title == "beamtime"
+        assert top.header["ItemCount"] == "2"
+        assert [item.title for item in top.children] == ["cycled_generated", "group.xy"]
+        assert exp.raw(top.children[0]) == igor_exp.raw(igor_exp.items[0]) + b"\n"
+        assert len(exp.regions) == len(igor_exp.regions) + len(xy_exp.regions)
+        sources = [(igor_exp, region) for region in igor_exp.regions]
+        sources += [(xy_exp, region) for region in xy_exp.regions]
+        for region, (source_exp, source) in zip(exp.regions, sources):
+            assert region.header == source.header
+            assert np.array_equal(exp.data(region), source_exp.data(source))
+
+    with open(merged, "wb") as f:
+        item_count = merge_exp([igor_file, xy_file], f, "beamtime", flatten=True)
+    with ExpFile(merged) as exp, ExpFile(xy_file) as xy_exp:
+        assert isinstance(xy_exp.items[0], ExpFolder)
+        assert item_count == 1 + len(xy_exp.items[0].children)
+        assert exp.items[0].header["ItemCount"] == str(item_count)
+        assert exp.items[0].children[0].title == "cycled__Pt4f_307_cycleSample1-1026 (avg)"
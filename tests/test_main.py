@@ -0,0 +1,269 @@
+import json
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from xps_convert.cache import MANIFEST_NAME, ConversionCache, hash_inputs
+from xps_convert import main, profiling
+from xps_convert.conversion import OutputFormat, plan_conversions, run_conversion
+from xps_convert.main import app
+from xps_convert.watch import Watcher
+
+testdata = Path(__file__).parent / "testdata"
+
+runner = CliRunner()
+
+
+def test_convert_jobs(tmp_path: Path):
+    files = [
+        shutil.copy(testdata / name, tmp_path)
+        for name in ["group.xy", "loop.xy", "analyzer_lens_mode.xy"]
+    ]
+    bad = tmp_path / "bad.xy"
+    _ = bad.write_text("not an xy file\n")
+
+    result = runner.invoke(app, [*map(str, files), str(bad), "--jobs", "2"])
+    assert result.exit_code == 0
+    assert "Failed to convert file bad.xy:" in result.output
+
+    for name in ["group", "loop", "analyzer_lens_mode"]:
+        assert (tmp_path / f"{name}.exp").read_text().startswith("[Folder]")
+
+
+def test_convert_igor_samples(tmp_path: Path):
+    for file in testdata.glob("*.pxt"):
+        _ = shutil.copy(file, tmp_path)
+    _ = shutil.copy(testdata / "test_matrix.ibw", tmp_path)
+
+    result = runner.invoke(app, [str(file) for file in sorted(tmp_path.iterdir())])
+    assert result.exit_code == 0
+    assert "Failed" not in result.output
+
+    sample = (tmp_path / "Sample1-1.exp").read_text().splitlines()
+    assert sample[2] == "Title=Sample1-1_generated"
+    assert sample[8] == "ItemCount=6"
+    assert (tmp_path / "test_matrix.exp").is_file()
+
+
+def test_convert_group_pattern(tmp_path: Path):
+    for file in testdata.glob("*.pxt"):
+        _ = shutil.copy(file, tmp_path)
+
+    result = runner.invoke(
+        app,
+        [*map(str, sorted(tmp_path.iterdir())), "--group-pattern", r"(Sample1-100[0-2])\d"],
+    )
+    assert result.exit_code == 0
+    assert sorted(file.name for file in tmp_path.glob("*.exp")) == [
+        "Sample1-1000.exp",
+        "Sample1-1002.exp",
+        "Sample1-10070.exp",
+    ]
+
+
+def test_convert_cache(tmp_path: Path):
+    group = Path(shutil.copy(testdata / "group.xy", tmp_path))
+    loop = Path(shutil.copy(testdata / "loop.xy", tmp_path))
+    args = [str(group), str(loop)]
+
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert "Skipping" not in result.output
+    assert (tmp_path / MANIFEST_NAME).is_file()
+
+    result = runner.invoke(app, args)
+    assert "Skipping unchanged file group.xy" in result.output
+    assert "Skipping unchanged file loop.xy" in result.output
+
+    with open(loop, "a") as f:
+        _ = f.write("\n")
+    result = runner.invoke(app, args)
+    assert "Skipping unchanged file group.xy" in result.output
+    assert f"Converting {loop}" in result.output
+
+    result = runner.invoke(app, [*args, "--force"])
+    assert "Skipping" not in result.output
+
+    group.unlink()
+    result = runner.invoke(app, [str(loop)])
+    assert "Skipping unchanged file loop.xy" in result.output
+    assert list(ConversionCache(tmp_path).entries) == ["loop.exp"]
+
+
+def test_convert_profile(tmp_path: Path):
+    scans = shutil.copy(testdata / "export_with_scans.xy", tmp_path)
+    pxt = shutil.copy(testdata / "Sample1-10026.pxt", tmp_path)
+    report_file = tmp_path / "profile.json"
+
+    result = runner.invoke(app, [str(scans), str(pxt), "--profile", str(report_file)])
+    assert result.exit_code == 0
+
+    report = json.loads(report_file.read_text())["conversions"]
+    assert [conversion["name"] for conversion in report] == ["export_with_scans.xy", "Sample1-1"]
+    for conversion in report:
+        assert conversion["error"] is None
+        assert conversion["output"] in conversion["files"]
+
+    xy_stages = report[0]["files"][str(scans)]
+    assert set(xy_stages) == {"header parse", "data decode", "averaging", "render"}
+    assert xy_stages["data decode"]["bytes_read"] == Path(scans).stat().st_size
+
+    igor_stages = report[1]["files"][str(pxt)]
+    assert set(igor_stages) == {"header parse", "data decode", "averaging", "render"}
+    assert igor_stages["data decode"]["points"] == 24 * 401
+    # the record header and the headers of the wave, read by the lazy index
+    # once for the item count and once more when the waves are written
+    assert igor_stages["header parse"]["bytes_read"] == 2 * (8 + 64 + 320)
+    assert igor_stages["data decode"]["bytes_read"] == Path(pxt).stat().st_size - 8
+    assert igor_stages["render"]["regions"] == 25
+    output_stages = report[1]["files"][report[1]["output"]]
+    assert set(output_stages) == {"open", "write"}
+    # every write of the rendered regions is timed, not only the final flush
+    assert output_stages["write"]["seconds"] > 0
+
+
+def test_convert_profile_npz(tmp_path: Path):
+    scans = shutil.copy(testdata / "export_with_scans.xy", tmp_path)
+    pxt = shutil.copy(testdata / "Sample1-10026.pxt", tmp_path)
+    report_file = tmp_path / "profile.json"
+
+    args = [str(scans), str(pxt), "--format", "npz", "--profile", str(report_file)]
+    result = runner.invoke(app, args)
+    assert result.exit_code == 0
+    assert result.output.count("Converting") == 2
+
+    report = json.loads(report_file.read_text())["conversions"]
+    xy_stages = report[0]["files"][str(scans)]
+    assert set(xy_stages) == {"header parse", "data decode"}
+    assert xy_stages["data decode"]["bytes_read"] == Path(scans).stat().st_size
+
+    igor_stages = report[1]["files"][str(pxt)]
+    assert set(igor_stages) == {"header parse", "data decode"}
+    assert igor_stages["data decode"]["points"] == 24 * 401
+    for conversion in report:
+        assert conversion["error"] is None
+        assert set(conversion["files"][conversion["output"]]) == {"open", "write"}
+
+
+def test_convert_without_profile(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    def peak_rss() -> int:
+        raise AssertionError("stages are only timed with --profile")
+
+    monkeypatch.setattr(profiling, "peak_rss", peak_rss)
+    scans = Path(shutil.copy(testdata / "export_with_scans.xy", tmp_path))
+    pxt = Path(shutil.copy(testdata / "Sample1-10026.pxt", tmp_path))
+    conversions = [
+        *plan_conversions([scans, pxt]),
+        *plan_conversions([scans, pxt], output_format=OutputFormat.npz),
+    ]
+    for conversion in conversions:
+        result = run_conversion(conversion)
+        assert result.error is None
+        assert result.profile is None
+        assert conversion.out_file.exists()
+
+
+def test_merge(tmp_path: Path):
+    files = [shutil.copy(testdata / name, tmp_path) for name in ["group.xy", "loop.xy"]]
+    result = runner.invoke(app, list(map(str, files)))
+    assert result.exit_code == 0
+
+    merged = tmp_path / "beamtime.exp"
+    result = runner.invoke(
+        app, ["merge", str(tmp_path / "group.exp"), str(tmp_path / "loop.exp"), "-o", str(merged)]
+    )
+    assert result.exit_code == 0
+    lines = merged.read_text().splitlines()
+    assert lines[2] == "Title=beamtime"
+    assert lines[8] == "ItemCount=2"
+    assert lines[-1] == "[EndFolder]"
+    assert not (tmp_path / "beamtime.exp.part").exists()
+
+
+def test_watch(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        watcher = Watcher(tmp_path, executor, settle=1)
+        loop = Path(shutil.copy(testdata / "loop.xy", tmp_path))
+        _ = shutil.copy(testdata / "Sample1-10002.pxt", tmp_path)
+        watcher.poll(now=0)
+        assert not watcher.running
+
+        watcher.poll(now=1)
+        assert sorted(watcher.running) == [tmp_path / "Sample1-1.exp", tmp_path / "loop.exp"]
+        watcher.close()
+        assert (tmp_path / "loop.exp").is_file()
+        assert sorted(ConversionCache(tmp_path).entries) == ["Sample1-1.exp", "loop.exp"]
+        assert (tmp_path / "Sample1-1.exp").read_text().splitlines()[8] == "ItemCount=1"
+
+        # a new file of the sample only reconverts the sample
+        _ = shutil.copy(testdata / "Sample1-10005.pxt", tmp_path)
+        watcher.poll(now=2)
+        watcher.poll(now=3)
+        assert list(watcher.running) == [tmp_path / "Sample1-1.exp"]
+        watcher.close()
+        assert (tmp_path / "Sample1-1.exp").read_text().splitlines()[8] == "ItemCount=4"
+
+        # touched without changes: skipped with the manifest
+        _ = capsys.readouterr()
+        loop.touch()
+        watcher.poll(now=4)
+        watcher.poll(now=5)
+        assert not watcher.running
+        assert "Skipping unchanged file loop.xy" in capsys.readouterr().out
+
+        # a removed file of the sample reconverts the sample without it
+        (tmp_path / "Sample1-10005.pxt").unlink()
+        watcher.poll(now=6)
+        assert list(watcher.running) == [tmp_path / "Sample1-1.exp"]
+        watcher.close()
+        assert (tmp_path / "Sample1-1.exp").read_text().splitlines()[8] == "ItemCount=1"
+
+
+def test_watch_requeues_changed_files(tmp_path: Path, capsys: pytest.CaptureFixture[str]):
+    release = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        # keep the only worker busy, so the conversions stay pending
+        _ = executor.submit(release.wait)
+        watcher = Watcher(tmp_path, executor, settle=1)
+        loop = Path(shutil.copy(testdata / "loop.xy", tmp_path))
+        watcher.poll(now=0)
+        watcher.poll(now=1)
+        assert list(watcher.running) == [tmp_path / "loop.exp"]
+
+        with open(loop, "a") as f:
+            _ = f.write("\n")
+        watcher.poll(now=2)
+        watcher.poll(now=3)
+        assert list(watcher.queued) == [tmp_path / "loop.exp"]
+
+        release.set()
+        watcher.close()
+        watcher.poll(now=4)
+        assert not watcher.queued
+        watcher.close()
+        assert capsys.readouterr().out.count(f"Converting {loop}") == 2
+        assert ConversionCache(tmp_path).is_fresh(
+            tmp_path / "loop.exp", hash_inputs([loop]), {}
+        )
+
+
+def test_convert_unreadable_input(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    files = [shutil.copy(testdata / name, tmp_path) for name in ["group.xy", "loop.xy"]]
+    hash_inputs = main.hash_inputs
+
+    def fail_for_group(files: list[Path]) -> dict[str, str]:
+        if files[0].name == "group.xy":
+            raise PermissionError(13, "Permission denied", str(files[0]))
+        return hash_inputs(files)
+
+    monkeypatch.setattr(main, "hash_inputs", fail_for_group)
+    result = runner.invoke(app, list(map(str, files)))
+    assert result.exit_code == 0
+    assert "Failed to convert file group.xy:" in result.output
+    assert "Permission denied" in result.output
+    assert (tmp_path / "loop.exp").is_file()
+    assert not (tmp_path / "group.exp").exists()
@@ -0,0 +1,44 @@
+from pathlib import Path
+
+import igor
+from xps_convert.ses import SESMetadata, kolxpd_notes, parse_ses_note
+
+testdata = Path(__file__).parent / "testdata"
+
+
+def test_parse_ses_note():
+    note = igor.PackedFile(str(testdata / "Sample1-10002.pxt")).records[0].note
+    metadata = parse_ses_note(note)
+    assert metadata == SESMetadata(
+        region_name="survey_307",
+        lens_mode="SwiftAcc_HiPP3L",
+        acquisition_mode="Swept",
+        energy_scale="Binding",
+        pass_energy=200,
+        excitation_energy=307.0007851233,
+        step_time=96,
+        sweeps=1,
+        low_energy=100.0007851233,
+        high_energy=327.0007851233,
+        energy_step=0.5,
+    )
+    # cached per note
+    assert parse_ses_note(note) is metadata
+
+
+def test_parse_ses_note_missing_and_invalid_values():
+    metadata = parse_ses_note("[SES]\nPass Energy=high\nNumber of Sweeps=2.5\nLens Mode = Wide\n")
+    assert metadata.pass_energy is None
+    assert metadata.sweeps is None
+    assert metadata.excitation_energy is None
+    assert metadata.lens_mode == "Wide"
+    assert parse_ses_note("") == SESMetadata()
+
+
+def test_first_occurrence_wins():
+    metadata = parse_ses_note("[SES]\nPass Energy=20\n[Other]\nPass Energy=50\n")
+    assert metadata.pass_energy == 20
+
+
+def test_kolxpd_notes():
+    assert kolxpd_notes("a=1\nb=2\n") == "a=1#0D#0Ab=2#0D#0A"
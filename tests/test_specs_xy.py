@@ -0,0 +1,162 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from xps_convert.specs_xy_to_kolxpd import (
+    Specs_XY_Data_Block,
+    get_data_avg,
+    index_xy_lines,
+    iter_xy_regions,
+)
+
+testdata = Path(__file__).parent / "testdata"
+
+XY_LOOP = testdata / "loop.xy"
+XY_SCANS = testdata / "export_with_scans.xy"
+
+LINES = [
+    "# Created by:        SpecsLab Prodigy\n",  # 0
+    "#\n",
+    "# Group:                        group\n",  # 2
+    "#\n",
+    "# Region:                       region\n",  # 4
+    "# Pass Energy:                  20\n",
+    "# Cycle: 0\n",  # 6
+    "# Number of Scans: 2\n",
+    "# Cycle: 0, Curve: 0, Scan: 0\n",  # 8
+    "1.0  10.0\n",
+    "# Cycle: 0, Curve: 0, Scan: 1\n",  # 10
+    "1.0  12.0\n",
+    "# Operation:                    operation\n",  # 12
+    "# Cycle: 0, Curve: 0\n",
+    "1.0  11.0\n",
+    "# Region:                       other\n",  # 15
+    "# Cycle: 0\n",  # 16
+    "# Cycle: 0, Curve: 0\n",  # 17
+    "2.0  1.0\n",
+]
+
+
+def test_index_xy_lines():
+    index = index_xy_lines(LINES)
+    assert index.header == range(0, 2)
+    assert len(index.groups) == 1
+
+    group = index.groups[0]
+    assert group.line == 2
+    assert len(group.regions) == 2
+
+    region, other = group.regions
+    assert region.header == range(4, 6)
+    assert len(region.cycles) == 1
+    assert region.cycles[0].number == "0"
+    assert region.cycles[0].header == range(6, 8)
+    # operation results are not part of the last scan
+    assert region.cycles[0].scans == [range(8, 10), range(10, 12)]
+
+    assert other.header == range(15, 16)
+    assert other.cycles[0].header == range(16, 17)
+    assert other.cycles[0].scans == [range(17, 19)]
+
+    # regions without data are dropped
+    lines = LINES[:4] + ["# Region:                       empty\n", "# Cycle: 0\n"] + LINES[4:]
+    index = index_xy_lines(lines)
+    assert len(index.groups[0].regions) == 2
+    assert index.groups[0].regions[0].header == range(6, 8)
+
+    index = index_xy_lines(LINES[:6])
+    assert index.groups[0].regions == []
+
+
+def test_index_xy_lines_loop():
+    with open(XY_LOOP, encoding="latin-1") as f:
+        lines = f.readlines()
+
+    index = index_xy_lines(lines)
+    assert len(index.groups) == 1
+    assert len(index.groups[0].regions) == 1
+
+    cycles = index.groups[0].regions[0].cycles
+    assert len(cycles) == 80
+    assert [cycle.number for cycle in cycles] == [str(i) for i in range(80)]
+    assert all(len(cycle.scans) == 1 for cycle in cycles)
+
+
+def test_data_block_columns():
+    lines = [
+        "# Cycle: 0, Curve: 0\n",
+        "#\n",
+        "# ColumnLabels:                 energy counts/s ext\n",
+        "86.31  6034.7843  1.5\n",
+        "\n",
+        "87.31  6128.0409  2.5\n",
+    ]
+    block = Specs_XY_Data_Block(lines, {})
+    assert block.data.shape == (2, 2)
+    assert block.data.dtype == np.float64
+    assert block.data.flags.c_contiguous
+    assert block.data.tolist() == [[86.31, 6034.7843], [87.31, 6128.0409]]
+
+    block = Specs_XY_Data_Block(iter(["86.31  6034.7843\n", "87.31  6128.0409\n"]), {})
+    assert block.data.tolist() == [[86.31, 6034.7843], [87.31, 6128.0409]]
+
+
+def test_iter_xy_regions():
+    regions = list(iter_xy_regions(XY_SCANS))
+    assert [region.header_parameters["Title"] for region in regions] == [
+        "Survey",
+        "Fine survey",
+        "O1s",
+        "Ti2p",
+        "C1s",
+        "Pt4f_Ti3s",
+        "VB",
+    ]
+    assert all(region.group.startswith("50 W Al") for region in regions)
+
+    survey, fine_survey = regions[:2]
+    assert [block.data.shape for block in survey.data_per_cycle["0"]] == [(1406, 2)]
+    blocks = fine_survey.data_per_cycle["0"]
+    assert [block.scan for block in blocks] == [1, 2, 3, 4, 5]
+    assert all(block.data.shape == (1211, 2) for block in blocks)
+    assert all(block.sweeps == "1" for block in blocks)
+
+
+def make_block(counts: list[float]) -> Specs_XY_Data_Block:
+    lines = [f"{i + 1.0} {value}\n" for i, value in enumerate(counts)]
+    return Specs_XY_Data_Block(lines, {"Title": "region"})
+
+
+def test_get_data_avg():
+    blocks = [make_block([1.0, 2.0, 3.0]), make_block([3.0, 4.0, float("nan")])]
+
+    avg = get_data_avg(blocks)
+    assert avg.data[:, 0].tolist() == [1.0, 2.0, 3.0]
+    assert avg.data[:2, 1].tolist() == [2.0, 3.0]
+    assert np.isnan(avg.data[2, 1])
+    assert avg.header_parameters is not blocks[0].header_parameters
+    # the data of the first block is left untouched
+    assert blocks[0].data[:, 1].tolist() == [1.0, 2.0, 3.0]
+
+    avg = get_data_avg(blocks, nan_aware=True)
+    assert avg.data[:, 1].tolist() == [2.0, 3.0, 3.0]
+
+    avg = get_data_avg(blocks, weights=[3, 1])
+    assert avg.data[:2, 1].tolist() == [1.5, 2.5]
+
+    avg = get_data_avg(blocks, nan_aware=True, weights=[3, 1])
+    assert avg.data[:, 1].tolist() == [1.5, 2.5, 3.0]
+
+
+def test_get_data_avg_invalid():
+    with pytest.raises(ValueError, match="same number"):
+        _ = get_data_avg([make_block([1.0, 2.0]), make_block([1.0])])
+
+    shifted = make_block([1.0, 2.0])
+    shifted.data[:, 0] += 0.5
+    with pytest.raises(ValueError, match="energy ranges"):
+        _ = get_data_avg([make_block([1.0, 2.0]), shifted])
+
+    with pytest.raises(TypeError):
+        _ = get_data_avg([make_block([1.0]), "block"])
@@ -0,0 +1,37 @@
+from pathlib import Path
+
+from xps_convert.watch import StableFiles
+
+
+def test_stable_files(tmp_path: Path):
+    files = StableFiles(tmp_path, (".xy", ".pxt"), settle=2)
+    spectrum = tmp_path / "spectrum.xy"
+    _ = spectrum.write_text("# Region 1\n")
+    _ = (tmp_path / "notes.txt").write_text("ignored")
+    _ = (tmp_path / "upper.PXT").write_bytes(b"")
+
+    assert files.poll(now=0) == []
+    assert files.poll(now=1) == []
+    assert files.poll(now=2) == [spectrum, tmp_path / "upper.PXT"]
+    # reported only once
+    assert files.poll(now=5) == []
+    assert files.stable == [spectrum, tmp_path / "upper.PXT"]
+
+    # written again: not stable until unchanged for 2 s
+    with open(spectrum, "a") as f:
+        _ = f.write("# Region 2\n")
+    assert files.poll(now=10) == []
+    assert files.stable == [tmp_path / "upper.PXT"]
+    assert files.poll(now=11) == []
+    assert files.poll(now=12) == [spectrum]
+
+    spectrum.unlink()
+    assert files.poll(now=20) == [spectrum]
+    assert files.poll(now=21) == []
+    assert files.stable == [tmp_path / "upper.PXT"]
+
+    # removed before it was stable: never reported
+    _ = spectrum.write_text("# Region 1\n")
+    assert files.poll(now=30) == []
+    spectrum.unlink()
+    assert files.poll(now=31) == []